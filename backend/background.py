@@ -1,8 +1,19 @@
-import torch
+import os
+import queue
 import threading
 import time
-import cv2
-from ultralytics import YOLO
+from model_registry import registry
+from inference_scheduler import InferenceScheduler
+from worker_pool import WorkerPool
+from frame_ring import DetectionBoard, RingCapture, RingReader, board_name, ring_name
+from capture import open_capture, transport_url
+from motion import MotionGate
+from rate_control import DetectionRateController
+from tiling import RegionOfInterest, TiledInference, parse_roi
+from postprocess import best_confidence
+from tracker import Tracker
+from prefilter import FlamePrefilter
+from detectors import Detections
 from models import db, Feed, User
 from config import Config
 from utils.fcm import send_push_notification
@@ -18,22 +29,33 @@ app = Flask(__name__)
 app.config.from_object(Config)
 db.init_app(app)
 
+
 class FireDetector:
-    def __init__(self, feed, user):
+    def __init__(self, feed, user, scheduler=None):
         self.feed = feed
         self.user = user
-        self.rtsp_url = feed.rtsp_url
-        # Check if CUDA is available
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        # The detector decodes the feed's cheap substream; viewers get the main stream
+        self.rtsp_url = feed.detection_stream
+
+        # 'unified' runs the combined fire+person model once per frame instead of
+        # a separate person pass during the post-fire window
+        self.unified = Config.DETECTOR_MODE == 'unified'
+
+        # Shared handles from the process-wide registry; weights load once per process
+        if self.unified:
+            self.fire_model = registry.acquire(Config.COMBINED_MODEL_PATH)
+            self.person_model = None
+        else:
+            self.fire_model = registry.acquire(Config.FIRE_MODEL_PATH)
+            self.person_model = registry.acquire(Config.PERSON_MODEL_PATH)
+        self.device = self.fire_model.device
         logger.info(f"Using device: {self.device}")
 
-        # Load models and move them to the appropriate device
-        self.fire_model = YOLO('../detection_models/yolo_models/baseline_11.pt')
-        self.fire_model.to(self.device)  # Move the fire model to the specified device
+        # When set, fire inference is batched with the other feeds
+        self.scheduler = scheduler
+        if self.scheduler:
+            self.scheduler.register(self)
 
-        self.person_model = YOLO('../detection_models/yolo_models/baseline_11_p.pt')
-        self.person_model.to(self.device)  # Move the person model to the specified device
-        
         self.running = True
         self.fire_notified = False
         self.person_notified = False
@@ -43,68 +65,226 @@ class FireDetector:
         self.post_fire_monitoring = False
         self.post_fire_start_time = 0
 
-    def detect_fire(self, frame):
-        results = self.fire_model(frame)
-        for result in results:
-            for box in result.boxes:
-                if box.conf[0] > 0.65:
-                    cls = int(box.cls[0])
-                    label = result.names[cls]
-                    if label.lower() == "fire":
-                        return True, float(box.conf[0])
-        return False, 0.0
-
-    def detect_person(self, frame):
-        results = self.person_model(frame)
-        for result in results:
-            for box in result.boxes:
-                if box.conf[0] > 0.65:
-                    cls = int(box.cls[0])
-                    label = result.names[cls]
-                    if label.lower() == "person":
-                        return True
+        self.last_frame = None
+        self.last_detections = None
+        self.last_person_detections = None
+
+        # Frames come from a capture thread, or with SHARED_FRAMES from the feed's shared-memory ring
+        self.shared_frames = Config.SHARED_FRAMES
+        self.frame_reader = None
+        # Results dropped because the capture process overwrote the ring slot while they were computed
+        self.lapped = 0
+        # With shared frames, results are also published for the viewer ingests of this camera
+        self.board = None
+        labels = list(self.fire_model.names.values())
+        if self.person_model:
+            labels += list(self.person_model.names.values())
+        self.board_labels = list(dict.fromkeys(labels))
+
+        # Optional change-detection stage that skips inference on static scenes
+        self.motion_gate = None
+        if Config.MOTION_GATING:
+            threshold = feed.motion_threshold if feed.motion_threshold is not None else Config.MOTION_THRESHOLD
+            self.motion_gate = MotionGate(
+                threshold=threshold,
+                max_idle=Config.MOTION_MAX_IDLE,
+                crop=Config.MOTION_CROP,
+            )
+
+        # Optional per-feed sampling rate that follows the alarm state
+        self.rate_controller = None
+        if Config.ADAPTIVE_RATE:
+            self.rate_controller = DetectionRateController(
+                idle_fps=Config.IDLE_FPS,
+                suspect_fps=Config.SUSPECT_FPS,
+                alarm_fps=Config.ALARM_FPS,
+                suspicion_conf=Config.SUSPICION_CONF,
+            )
+
+        # Optional polygon ROI; boxes outside it are ignored
+        self.roi_source = feed.roi
+        self.roi = RegionOfInterest(parse_roi(feed.roi)) if feed.roi else None
+
+        # Optional colour/flicker cascade stage that skips the fire model on frames with nothing flame-like
+        self.prefilter = None
+        if Config.PREFILTER:
+            self.prefilter = FlamePrefilter(min_flame=Config.PREFILTER_MIN_FLAME, min_flicker=Config.PREFILTER_MIN_FLICKER)
+
+        # Optional fire/smoke tracker; confirms fire by track age and lets inference skip frames
+        self.tracker = None
+        if Config.TRACKING:
+            self.tracker = Tracker(max_coast=Config.TRACK_MAX_COAST, coast_interval=Config.TRACK_COAST_INTERVAL)
+
+        # Optional low-resolution first pass that escalates to full resolution on fire/smoke candidates
+        self.cascade = Config.CASCADE
+        if self.cascade and (self.scheduler or Config.TILED_INFERENCE):
+            logger.warning("Resolution cascade is not applied with batched or tiled inference")
+        elif self.cascade and not self.fire_model.dynamic_size:
+            # Every low-resolution pass would fail, and with it fire detection outside incidents
+            logger.warning(f"Resolution cascade disabled: {self.fire_model.path} has a fixed "
+                           f"{self.fire_model.imgsz}px input; export it with --dynamic to use the cascade")
+            self.cascade = False
+        self.cascade_frames = 0
+        self.cascade_escalations = 0
+
+        # Tiled mode only infers model-sized tiles overlapping the ROI
+        self.tiler = None
+        if Config.TILED_INFERENCE:
+            self.tiler = TiledInference(tile_size=self.fire_model.imgsz, overlap=Config.TILE_OVERLAP, roi=self.roi)
+
+    def _escalate(self, model, frame):
+        # Cheap low-resolution pass; only frames with a fire/smoke candidate pay for full resolution
+        low = model(frame, imgsz=Config.CASCADE_LOW_SIZE, conf=Config.CASCADE_ESCALATE_CONF)
+        self.cascade_frames += 1
+        if best_confidence(low, ("fire", "smoke"), Config.CASCADE_ESCALATE_CONF) == 0:
+            return low
+        self.cascade_escalations += 1
+        return model(frame)
+
+    def _infer(self, model, frame, region=None, cascade=False):
+        # Boxes in frame coordinates, restricted to the ROI
+        if self.tiler:
+            return self.tiler.run(model, frame, region)
+        shape = frame.shape
+        if region:
+            x1, y1, x2, y2 = region
+            frame = frame[y1:y2, x1:x2]
+        if self.scheduler and model is self.fire_model:
+            detections = self.scheduler.submit(self, frame).result()
+        elif cascade:
+            detections = self._escalate(model, frame)
+        else:
+            detections = model(frame)
+        if region:
+            detections = detections.shifted(x1, y1)
+        if self.roi:
+            detections = self.roi.filter(detections, shape)
+        return detections
+
+    def detect_fire(self, frame, region=None, cascade=False):
+        detections = self._infer(self.fire_model, frame, region, cascade)
+        self.last_frame = frame
+        self.last_detections = detections
+        confidence = best_confidence(detections, ("fire",), 0.65)
+        return confidence > 0, confidence
+
+    def detect_person(self, frame, region=None):
+        if self.unified and frame is self.last_frame:
+            # The combined model already saw this frame in detect_fire
+            detections = self.last_detections
+        elif self.unified:
+            detections = self._infer(self.fire_model, frame, region)
+        else:
+            detections = self._infer(self.person_model, frame, region)
+            self.last_person_detections = detections
+        return best_confidence(detections, ("person",), 0.65) > 0
+
+    def suspicion(self):
+        # Highest fire/smoke confidence of the last inference, below the alert threshold too
+        if self.last_detections is None:
+            return 0.0
+        return best_confidence(self.last_detections, ("fire", "smoke"))
+
+    def _share(self, frame, timestamp, *results):
+        # One row per box with the class as an index into board_labels, which covers both models
+        if not self.board:
+            return
+        rows = []
+        for detections in results:
+            index = {cls: self.board_labels.index(name) for cls, name in detections.names.items()}
+            for box, conf, cls in zip(detections.xyxy.tolist(), detections.conf.tolist(), detections.cls.tolist()):
+                rows.append((*box, conf, index[cls]))
+        self.board.write(timestamp, frame.shape, rows)
+
+    def _open_capture(self):
+        if self.shared_frames:
+            try:
+                self.board = DetectionBoard.create(board_name(self.rtsp_url), self.board_labels)
+            except Exception as e:
+                logger.error(f"Could not publish detections of {self.rtsp_url} to viewers: {e}")
+            self.frame_reader = RingReader(ring_name(self.rtsp_url))
+        else:
+            # Decoding never waits for inference, so detections don't fall behind the camera;
+            # the pyav backend scales to the model input unless tiles need full resolution
+            size = None if self.tiler else self.fire_model.imgsz
+            self.frame_reader = open_capture(self.rtsp_url, Config.CAPTURE_BACKEND, transport='udp',
+                                             size=size, threads=Config.CAPTURE_THREADS)
+        return self.frame_reader
+
+    def _lapped(self, cap):
+        # A ring view is not a copy: the writer may have reused its slot during inference
+        if self.shared_frames and not cap.fresh():
+            self.lapped += 1
+            return True
         return False
 
     def run_detection(self):
-        cap = None
-        reconnect_attempts = 0
+        # The frame source connects, reconnects and picks the transport on its own
+        cap = self._open_capture()
         fire_start_time = 0
 
         while self.running:
             try:
-                if cap is None or not cap.isOpened():
-                    logger.info(f"Connecting to stream: {self.rtsp_url}")
-                    connection_url = self.rtsp_url
-                    if self.rtsp_url.startswith("rtsp://"):
-                        if "?" not in connection_url:
-                            connection_url += "?transport=udp"
-                        elif "&transport=" not in connection_url and "transport=" not in connection_url:
-                            connection_url += "&transport=udp"
-                    cap = cv2.VideoCapture(connection_url)
-                    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-
-                    if not cap.isOpened():
-                        reconnect_attempts += 1
-                        logger.warning(f"Failed to connect to {self.rtsp_url} (attempt {reconnect_attempts})")
-                        time.sleep(min(reconnect_attempts, 5))
-                        continue
-                    reconnect_attempts = 0
-
                 ret, frame = cap.read()
+                # Timestamp of the frame itself; all alert timing is based on it
+                current_time = cap.timestamp
                 if not ret:
-                    logger.warning(f"Failed to read frame from {self.rtsp_url}")
-                    cap.release()
-                    cap = None
+                    logger.warning(f"No frame from {self.rtsp_url} in {cap.timeout:.0f}s")
+                    continue
+                if self.board:
+                    # Frames skipped below keep the last published result current for viewers
+                    self.board.beat()
+
+                if self.rate_controller and not self.rate_controller.due(current_time):
+                    continue
+
+                # Cheap stages never gate frames while a fire is being confirmed or followed up
+                incident = fire_start_time != 0 or self.post_fire_monitoring
+
+                run_inference, region = True, None
+                if self.motion_gate:
+                    run_inference, region = self.motion_gate.check(frame, current_time, force=incident)
+
+                if not run_inference:
+                    # Static scene: the previous decision still holds
                     continue
 
-                frame = cv2.resize(frame, (480, 272))
-                fire_detected, confidence = self.detect_fire(frame)
-                current_time = time.time()
+                flame_like = self.prefilter.check(frame) if self.prefilter else True
+
+                if self.tracker and not self.tracker.should_infer(current_time):
+                    # Established tracks coast on their motion model between refreshes
+                    self.tracker.coast(current_time)
+                elif not flame_like and not incident:
+                    if self._lapped(cap):
+                        continue
+                    # Rejected by the cascade: count it as a frame without fire
+                    fire_detected, confidence = False, 0.0
+                    self.last_detections = Detections.empty(self.fire_model.names)
+                    self._share(frame, current_time, self.last_detections)
+                    if self.tracker:
+                        self.tracker.update(self.last_detections, current_time)
+                else:
+                    fire_detected, confidence = self.detect_fire(frame, region, cascade=self.cascade and not incident)
+                    if self._lapped(cap):
+                        # The boxes may come from a half-overwritten or different frame; wait for the next one
+                        continue
+                    self._share(frame, current_time, self.last_detections)
+                    if self.tracker:
+                        self.tracker.update(self.last_detections, current_time)
+
+                fire_track = None
+                if self.tracker:
+                    # A flickering fire keeps its track, so one missed frame doesn't reset confirmation
+                    fire_track = self.tracker.oldest(self.fire_model.names, ("fire",), 0.65)
+                    fire_detected = fire_track is not None
+                    confidence = fire_track.confidence if fire_track else 0.0
 
                 if fire_detected:
                     if fire_start_time == 0:
                         fire_start_time = current_time
                         logger.info(f"🔥 Potential fire detected in feed: {self.rtsp_url} (confidence: {confidence:.2f})")
+                    if fire_track:
+                        fire_start_time = fire_track.first_seen
 
                     if current_time - fire_start_time > 1:
                         if not self.fire_notified and current_time - self.last_notification_time > self.notification_cooldown:
@@ -130,7 +310,12 @@ class FireDetector:
 
                 if self.post_fire_monitoring:
                     if current_time - self.post_fire_start_time < 10:
-                        person_found = self.detect_person(frame)
+                        person_found = self.detect_person(frame, region)
+                        if self._lapped(cap):
+                            person_found = False
+                        elif not self.unified:
+                            # The separate person pass is shown to viewers alongside the fire boxes
+                            self._share(frame, current_time, self.last_detections, self.last_person_detections)
                         if person_found and not self.person_notified:
                             logger.info(f"👤 Person detected post-fire in feed {self.rtsp_url}")
                             send_push_notification(
@@ -142,15 +327,25 @@ class FireDetector:
                     else:
                         self.post_fire_monitoring = False
 
+                if self.rate_controller:
+                    incident = fire_start_time != 0 or self.post_fire_monitoring
+                    self.rate_controller.update(current_time, self.suspicion(), incident)
+                    if Config.KEYFRAME_IDLE and hasattr(cap, 'keyframes_only'):
+                        # At the idle rate most decoded delta frames are thrown away; keyframes keep the scene current
+                        cap.keyframes_only = self.rate_controller.state == DetectionRateController.IDLE
+
             except Exception as e:
                 logger.error(f"Detection error for {self.rtsp_url}: {e}")
-                if cap:
-                    cap.release()
-                    cap = None
                 time.sleep(1)
 
-        if cap:
-            cap.release()
+        cap.release()
+        if self.board:
+            self.board.close()
+        if self.scheduler:
+            self.scheduler.unregister(self)
+        self.fire_model.release()
+        if self.person_model:
+            self.person_model.release()
         logger.info(f"Detection thread stopped for {self.rtsp_url}")
 
     def start(self):
@@ -164,14 +359,124 @@ class FireDetector:
         logger.info(f"Stopping detector for {self.rtsp_url}")
 
 
+def create_scheduler():
+    if not Config.BATCH_INFERENCE:
+        return None
+    model_path = Config.COMBINED_MODEL_PATH if Config.DETECTOR_MODE == 'unified' else Config.FIRE_MODEL_PATH
+    scheduler = InferenceScheduler(
+        model_path,
+        max_batch_size=Config.BATCH_MAX_SIZE,
+        max_wait=Config.BATCH_MAX_WAIT_MS / 1000,
+    )
+    scheduler.start()
+    return scheduler
+
+
+def log_detector_stats(active_detectors):
+    registry.log_stats()
+    for feed_id, detector in active_detectors.items():
+        if detector.frame_reader:
+            reader = detector.frame_reader
+            logger.info(f"Feed {feed_id}: read {reader.frames} frames, dropped {reader.dropped} stale frames")
+            if detector.shared_frames:
+                logger.info(f"Feed {feed_id}: {reader.torn} shared frames lapped before they were read, "
+                            f"{detector.lapped} results dropped because their frame was overwritten during inference")
+        if detector.rate_controller:
+            logger.info(f"Feed {feed_id}: sampling in {detector.rate_controller.state} mode")
+        if detector.cascade_frames:
+            logger.info(f"Feed {feed_id}: resolution cascade escalated "
+                        f"{detector.cascade_escalations / detector.cascade_frames:.1%} of "
+                        f"{detector.cascade_frames} frames")
+        if detector.prefilter:
+            logger.info(f"Feed {feed_id}: flame pre-filter passed "
+                        f"{detector.prefilter.pass_rate:.1%} of {detector.prefilter.frames} frames")
+        if detector.motion_gate:
+            logger.info(f"Feed {feed_id}: motion gate skipped "
+                        f"{detector.motion_gate.skip_ratio:.1%} of {detector.motion_gate.frames} frames")
+
+
+def run_worker(index, commands):
+    """
+    Body of a detection worker process (see worker_pool.py). Starts and stops
+    FireDetector threads as the parent assigns feeds, with its own models and
+    batch scheduler.
+    """
+    logger.info(f"Detection worker {index} running in pid {os.getpid()}")
+    active_detectors = {}
+    scheduler = create_scheduler()
+    last_stats = time.monotonic()
+
+    with app.app_context():
+        while True:
+            try:
+                command, feed_id = commands.get(timeout=5)
+            except queue.Empty:
+                command, feed_id = None, None
+
+            try:
+                if command == 'shutdown':
+                    break
+
+                if command == 'stop' and feed_id in active_detectors:
+                    active_detectors.pop(feed_id).stop()
+
+                if command == 'start' and feed_id not in active_detectors:
+                    feed = db.session.get(Feed, feed_id)
+                    if feed:
+                        # The row may have changed (e.g. its ROI) since this session last loaded it
+                        db.session.refresh(feed)
+                    user = db.session.get(User, feed.user_id) if feed else None
+                    if user and feed.rtsp_url:
+                        detector = FireDetector(feed, user, scheduler)
+                        detector.start()
+                        active_detectors[feed_id] = detector
+
+                if time.monotonic() - last_stats >= 60:
+                    last_stats = time.monotonic()
+                    log_detector_stats(active_detectors)
+
+            except Exception as e:
+                logger.error(f"Error in detection worker {index}: {e}")
+
+    for detector in active_detectors.values():
+        detector.stop()
+    if scheduler:
+        scheduler.stop()
+    logger.info(f"Detection worker {index} stopped")
+
+
+def supervise(pool, captures, duration, interval=1.0):
+    # Sleep for duration while replacing dead worker and capture processes as soon as they are noticed
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        if pool:
+            pool.check()
+        for capture in captures.values():
+            capture.check()
+        time.sleep(interval)
+
+
 def monitor_feeds():
     active_detectors = {}
+    scheduler = None
+    pool = None
+    # Capture process per feed when frames are shared through memory
+    captures = {}
+    # ROI each pooled feed was started with
+    pooled_rois = {}
+    if Config.DETECTION_WORKERS > 0:
+        pool = WorkerPool(Config.DETECTION_WORKERS, Config.DETECTOR_THREADS)
+        pool.start()
+    else:
+        scheduler = create_scheduler()
 
     with app.app_context():
         while True:
             try:
                 feeds = Feed.query.all()
                 current_feed_ids = set()
+                # Column queries bypass the identity map, so ROI edits are seen without a restart
+                rois = dict(db.session.query(Feed.id, Feed.roi).all())
 
                 for feed in feeds:
                     current_feed_ids.add(feed.id)
@@ -180,8 +485,30 @@ def monitor_feeds():
                     if not user or not feed.rtsp_url:
                         continue
 
+                    if Config.SHARED_FRAMES and feed.id not in captures:
+                        capture = RingCapture(transport_url(feed.detection_stream), ring_name(feed.detection_stream),
+                                              slots=Config.FRAME_RING_SLOTS)
+                        capture.start()
+                        captures[feed.id] = capture
+
+                    if pool:
+                        if feed.id in pooled_rois and pooled_rois[feed.id] != rois.get(feed.id):
+                            logger.info(f"ROI changed for feed {feed.id}, restarting its detector")
+                            pool.restart(feed.id)
+                        else:
+                            pool.assign(feed.id)
+                        pooled_rois[feed.id] = rois.get(feed.id)
+                        continue
+
+                    detector = active_detectors.get(feed.id)
+                    if detector and detector.roi_source != rois.get(feed.id):
+                        logger.info(f"ROI changed for feed {feed.id}, restarting its detector")
+                        detector.stop()
+                        del active_detectors[feed.id]
+                        db.session.refresh(feed)
+
                     if feed.id not in active_detectors:
-                        detector = FireDetector(feed, user)
+                        detector = FireDetector(feed, user, scheduler)
                         detector.start()
                         active_detectors[feed.id] = detector
 
@@ -194,7 +521,21 @@ def monitor_feeds():
                 for feed_id in feeds_to_remove:
                     del active_detectors[feed_id]
 
-                time.sleep(60)
+                for feed_id in list(pooled_rois):
+                    if feed_id not in current_feed_ids:
+                        pool.remove(feed_id)
+                        del pooled_rois[feed_id]
+
+                for feed_id in list(captures):
+                    if feed_id not in current_feed_ids:
+                        captures.pop(feed_id).stop()
+
+                if pool:
+                    # Workers log their own model and feed stats
+                    pool.log_stats()
+                else:
+                    log_detector_stats(active_detectors)
+                supervise(pool, captures, 60)
 
             except Exception as e:
                 logger.error(f"Error in monitor_feeds: {e}")
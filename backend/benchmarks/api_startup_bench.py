@@ -0,0 +1,56 @@
+# api_startup_bench.py
+# Cold-start time and peak RSS of the API process, and which ML modules it
+# imports at boot. Each run imports the module in a fresh interpreter.
+#
+# Usage (from backend/):
+#   python benchmarks/api_startup_bench.py --runs 5
+#   python benchmarks/api_startup_bench.py --module mjpeg    # what the first stream request loads (mjpeg, and through it ingest)
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('torch', 'ultralytics', 'cv2', 'numpy', 'onnxruntime', 'openvino', 'av', 'aiortc')
+
+PROBE = """
+import resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, ','.join(heavy) or '-')
+"""
+
+
+def run_once(module):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    wall = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    return wall, float(output[-3]), int(output[-2]) / 1024, output[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API cold start')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    print(f"import {args.module}: {args.runs} cold starts\n")
+    print("| Process start | Import | Peak RSS | ML modules loaded |")
+    print("|---------------|--------|----------|-------------------|")
+    print(f"| {statistics.median(r[0] for r in runs) * 1000:.0f} ms "
+          f"| {statistics.median(r[1] for r in runs) * 1000:.0f} ms "
+          f"| {statistics.median(r[2] for r in runs):.0f} MiB "
+          f"| {runs[-1][3]} |")
+
+
+if __name__ == '__main__':
+    main()
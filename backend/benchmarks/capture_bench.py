@@ -0,0 +1,82 @@
+# capture_bench.py
+# CPU cost per stream of the OpenCV and PyAV capture backends.
+#
+# Each configuration decodes the stream for --seconds while a consumer pulls
+# frames at --fps, like a detector would; decode threads run in this process,
+# so process CPU time covers them.
+#
+# Usage (from backend/):
+#   python benchmarks/capture_bench.py rtsp://camera/stream --seconds 30
+#   python benchmarks/capture_bench.py sample_1080p.mp4 --size 640
+import argparse
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from capture import LatestFrameCapture, PyAVCapture  # noqa: E402
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(cap, seconds, fps):
+    # Let the stream connect before timing
+    ok, frame = cap.read()
+    if not ok:
+        cap.release()
+        return None
+    decoded_before, cpu_before, start = cap.decoded, cpu_seconds(), time.perf_counter()
+    shape = frame.shape
+    while time.perf_counter() - start < seconds:
+        ok, frame = cap.read()
+        if ok:
+            shape = frame.shape
+        time.sleep(1 / fps)
+    wall = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu_before
+    decoded = cap.decoded - decoded_before
+    cap.release()
+    return cpu / wall, decoded / wall, shape
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark capture backends')
+    parser.add_argument('url')
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--fps', type=float, default=5, help='Rate the consumer pulls frames at')
+    parser.add_argument('--size', type=int, default=640, help='Long side the pyav backend scales to')
+    parser.add_argument('--threads', type=int, default=0, help='FFmpeg decode threads (0 = auto)')
+    parser.add_argument('--transport', default='udp')
+    args = parser.parse_args()
+
+    configs = [
+        ('opencv', lambda: LatestFrameCapture(args.url, args.transport)),
+        ('pyav', lambda: PyAVCapture(args.url, args.transport, threads=args.threads)),
+        (f'pyav, scaled to {args.size}', lambda: PyAVCapture(args.url, args.transport, size=args.size,
+                                                             threads=args.threads)),
+    ]
+
+    def keyframes_only():
+        cap = PyAVCapture(args.url, args.transport, size=args.size, threads=args.threads)
+        cap.keyframes_only = True
+        return cap
+    configs.append(('pyav, keyframes only', keyframes_only))
+
+    print(f"{args.url}: {args.seconds:.0f} s per backend, consumer at {args.fps:g} fps\n")
+    print("| Backend | CPU (cores) | Decoded fps | Frame size |")
+    print("|---------|-------------|-------------|------------|")
+    for name, factory in configs:
+        result = measure(factory(), args.seconds, args.fps)
+        if result is None:
+            print(f"| {name} | failed to read | | |")
+            continue
+        cores, decoded_fps, shape = result
+        print(f"| {name} | {cores:.2f} | {decoded_fps:.1f} | {shape[1]}x{shape[0]} |")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# cascade_bench.py
+# Average cost per frame and end-to-end fire recall of the 320 -> 640 px
+# resolution cascade against single-resolution inference.
+#
+# Usage (from backend/):
+#   python benchmarks/cascade_bench.py --data ../detection_models/yolo_models/merged_dataset --limit 1000
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config  # noqa: E402
+from detectors import create_detector  # noqa: E402
+from postprocess import best_confidence  # noqa: E402
+from compare_unified import FIRE_CLASS, Tally, load_samples  # noqa: E402
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the resolution cascade')
+    parser.add_argument('--data', default='../detection_models/yolo_models/merged_dataset')
+    parser.add_argument('--split', default='val')
+    parser.add_argument('--limit', type=int, default=500)
+    # The model FireDetector runs the cascade on in the configured DETECTOR_MODE
+    fire_weights = Config.COMBINED_MODEL_PATH if Config.DETECTOR_MODE == 'unified' else Config.FIRE_MODEL_PATH
+    parser.add_argument('--weights', default=fire_weights)
+    parser.add_argument('--backend', default=Config.DETECTOR_BACKEND)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--low', type=int, default=Config.CASCADE_LOW_SIZE)
+    parser.add_argument('--high', type=int, default=640)
+    parser.add_argument('--escalate-conf', type=float, default=Config.CASCADE_ESCALATE_CONF)
+    parser.add_argument('--conf', type=float, default=0.65, help='Alert threshold used by FireDetector')
+    args = parser.parse_args()
+
+    detector = create_detector(args.weights, args.backend, args.device)
+    samples = load_samples(args.data, args.split, args.limit)
+    if not samples:
+        sys.exit(f"No images found under {args.data}/images/{args.split}")
+
+    warmup = cv2.imread(samples[0][0])
+    for _ in range(5):
+        detector(warmup, imgsz=args.low)
+        detector(warmup, imgsz=args.high)
+
+    single_cost, cascade_cost = [], []
+    single_tally, cascade_tally = Tally(), Tally()
+    escalated = 0
+    for image_path, classes in samples:
+        frame = cv2.imread(image_path)
+        if frame is None:
+            continue
+        has_fire = FIRE_CLASS in classes
+
+        single, cost = timed(detector, frame, imgsz=args.high)
+        single_cost.append(cost)
+        single_tally.add(best_confidence(single, ("fire",), args.conf) > 0, has_fire)
+
+        final, cost = timed(detector, frame, imgsz=args.low, conf=args.escalate_conf)
+        if best_confidence(final, ("fire", "smoke"), args.escalate_conf) > 0:
+            escalated += 1
+            final, high_cost = timed(detector, frame, imgsz=args.high)
+            cost += high_cost
+        cascade_cost.append(cost)
+        cascade_tally.add(best_confidence(final, ("fire",), args.conf) > 0, has_fire)
+
+    frames = len(single_cost)
+    print(f"{frames} images from {args.data} ({args.split}), {args.backend} backend, "
+          f"escalation at {args.escalate_conf}, alert threshold {args.conf}\n")
+    print("| Path | Cost per frame | Escalated | Fire recall | Fire precision |")
+    print("|------|----------------|-----------|-------------|----------------|")
+    print(f"| {args.high} px only | {sum(single_cost) / frames:.1f} ms | — "
+          f"| {single_tally.recall():.3f} | {single_tally.precision():.3f} |")
+    print(f"| {args.low} -> {args.high} px cascade | {sum(cascade_cost) / frames:.1f} ms | {escalated / frames:.1%} "
+          f"| {cascade_tally.recall():.3f} | {cascade_tally.precision():.3f} |")
+
+
+if __name__ == '__main__':
+    main()
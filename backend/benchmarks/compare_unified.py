@@ -0,0 +1,121 @@
+# compare_unified.py
+# Latency and alert-accuracy comparison of the two-model detector path
+# (fire model + person model) against the unified combined model.
+#
+# Usage (from backend/):
+#   python benchmarks/compare_unified.py --data ../detection_models/yolo_models/merged_dataset --limit 500
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config  # noqa: E402
+from detectors import create_detector  # noqa: E402
+from postprocess import best_confidence  # noqa: E402
+
+# Class ids in the merged dataset built by integrating_models.ipynb
+FIRE_CLASS = 1
+PERSON_CLASS = 2
+
+
+def load_samples(data_dir, split, limit):
+    image_dir = os.path.join(data_dir, 'images', split)
+    label_dir = os.path.join(data_dir, 'labels', split)
+    samples = []
+    for name in sorted(os.listdir(image_dir))[:limit]:
+        label_path = os.path.join(label_dir, os.path.splitext(name)[0] + '.txt')
+        classes = set()
+        if os.path.exists(label_path):
+            with open(label_path) as f:
+                classes = {int(line.split()[0]) for line in f if line.strip()}
+        samples.append((os.path.join(image_dir, name), classes))
+    return samples
+
+
+def has_label(detections, label, conf):
+    return best_confidence(detections, (label,), conf) > 0
+
+
+class Tally:
+    def __init__(self):
+        self.tp = self.fp = self.fn = 0
+
+    def add(self, predicted, actual):
+        if predicted and actual:
+            self.tp += 1
+        elif predicted:
+            self.fp += 1
+        elif actual:
+            self.fn += 1
+
+    def precision(self):
+        return self.tp / max(self.tp + self.fp, 1)
+
+    def recall(self):
+        return self.tp / max(self.tp + self.fn, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two-model and unified detection')
+    parser.add_argument('--data', default='../detection_models/yolo_models/merged_dataset')
+    parser.add_argument('--split', default='val')
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--conf', type=float, default=0.65, help='Alert threshold used by FireDetector')
+    parser.add_argument('--backend', default=Config.DETECTOR_BACKEND)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--warmup', type=int, default=5)
+    args = parser.parse_args()
+
+    fire_model = create_detector(Config.FIRE_MODEL_PATH, args.backend, args.device)
+    person_model = create_detector(Config.PERSON_MODEL_PATH, args.backend, args.device)
+    combined_model = create_detector(Config.COMBINED_MODEL_PATH, args.backend, args.device)
+
+    samples = load_samples(args.data, args.split, args.limit)
+    if not samples:
+        sys.exit(f"No images found under {args.data}/images/{args.split}")
+
+    warmup = cv2.imread(samples[0][0])
+    for _ in range(args.warmup):
+        fire_model(warmup)
+        person_model(warmup)
+        combined_model(warmup)
+
+    latency = {'two-model': [], 'unified': []}
+    tallies = {path: {'fire': Tally(), 'person': Tally()} for path in latency}
+
+    for image_path, classes in samples:
+        frame = cv2.imread(image_path)
+        if frame is None:
+            continue
+
+        # Two-model path during the post-fire window: both models on every frame
+        start = time.perf_counter()
+        fire_results = fire_model(frame)
+        person_results = person_model(frame)
+        latency['two-model'].append(time.perf_counter() - start)
+        tallies['two-model']['fire'].add(has_label(fire_results, 'fire', args.conf), FIRE_CLASS in classes)
+        tallies['two-model']['person'].add(has_label(person_results, 'person', args.conf), PERSON_CLASS in classes)
+
+        start = time.perf_counter()
+        results = combined_model(frame)
+        latency['unified'].append(time.perf_counter() - start)
+        tallies['unified']['fire'].add(has_label(results, 'fire', args.conf), FIRE_CLASS in classes)
+        tallies['unified']['person'].add(has_label(results, 'person', args.conf), PERSON_CLASS in classes)
+
+    print(f"{len(latency['unified'])} images from {args.data} ({args.split}), "
+          f"{args.backend} backend, alert threshold {args.conf}\n")
+    print("| Path      | Latency (mean) | Latency (p95) | Fire P / R    | Person P / R  |")
+    print("|-----------|----------------|---------------|---------------|---------------|")
+    for path, times in latency.items():
+        times_ms = np.array(times) * 1000
+        fire, person = tallies[path]['fire'], tallies[path]['person']
+        print(f"| {path:<9} | {times_ms.mean():>11.1f} ms | {np.percentile(times_ms, 95):>10.1f} ms "
+              f"| {fire.precision():.3f} / {fire.recall():.3f} | {person.precision():.3f} / {person.recall():.3f} |")
+
+
+if __name__ == '__main__':
+    main()
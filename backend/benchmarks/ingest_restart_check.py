@@ -0,0 +1,62 @@
+# ingest_restart_check.py
+# Checks that a hub subscriber keeps receiving frames, with increasing frame
+# numbers, after the camera's ingest stops and is replaced. Consumers such as
+# the WebRTC track and the asyncio MJPEG bridge keep their own seq cursor and
+# freeze if numbering restarts.
+#
+# Usage (from backend/):
+#   python benchmarks/ingest_restart_check.py rtsp://camera/stream --seconds 10
+#   python benchmarks/ingest_restart_check.py sample.mp4 --restarts 3
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingest import hub  # noqa: E402
+
+
+def collect(subscription, seconds, last_seq):
+    """(frames received, last seq, whether seq always increased) over seconds."""
+    frames, increasing = 0, True
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        item = subscription.get(timeout=1.0)
+        if item is None:
+            continue
+        if item.seq <= last_seq:
+            increasing = False
+        last_seq = item.seq
+        frames += 1
+    return frames, last_seq, increasing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check frame delivery across ingest restarts')
+    parser.add_argument('url')
+    parser.add_argument('--seconds', type=float, default=10, help='Reading time before and after each restart')
+    parser.add_argument('--restarts', type=int, default=1)
+    args = parser.parse_args()
+
+    failures = 0
+    with hub.subscribe(args.url) as subscription:
+        frames, last_seq, increasing = collect(subscription, args.seconds, 0)
+        print(f"before restart: {frames} frames, last seq {last_seq}")
+        if not frames:
+            sys.exit("No frames from the stream; nothing to check")
+        for restart in range(1, args.restarts + 1):
+            # As if the ingest had given up; the subscription moves to a new one on its own
+            old = subscription.ingest
+            old.stop()
+            frames, last_seq, increasing = collect(subscription, args.seconds, last_seq)
+            moved = subscription.ingest is not old
+            ok = moved and frames > 0 and increasing
+            failures += not ok
+            print(f"after restart {restart}: {frames} frames, last seq {last_seq}, "
+                  f"{'new ingest' if moved else 'same ingest'}, "
+                  f"seq {'increasing' if increasing else 'went backwards'} -> {'ok' if ok else 'FAIL'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
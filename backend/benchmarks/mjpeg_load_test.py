@@ -0,0 +1,87 @@
+# mjpeg_load_test.py
+# Server memory and CPU with many idle-but-connected MJPEG viewers.
+#
+# Opens --viewers connections to one stream URL; each reads the first frame
+# and then stops reading while keeping its connection open (a backgrounded
+# phone), or keeps reading with --read. The server process is sampled with
+# psutil before and while the viewers are connected.
+#
+# Usage (from backend/, with stream_server.py or streaming.py running):
+#   python benchmarks/mjpeg_load_test.py "http://localhost:5004/mjpeg/1?token=<jwt>" --pid <server pid>
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+import psutil
+
+
+async def viewer(session, url, read, connected, stop):
+    try:
+        async with session.get(url) as response:
+            if response.status != 200:
+                return
+            await response.content.readuntil(b'--frame')
+            connected.append(1)
+            while read and not stop.is_set():
+                await response.content.readany()
+            await stop.wait()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+
+
+async def sample(process, seconds):
+    samples = []
+    process.cpu_percent(None)
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        await asyncio.sleep(1)
+        samples.append((process.cpu_percent(None), process.memory_info().rss, process.num_threads()))
+    return samples
+
+
+def row(label, viewers, samples):
+    cpu = statistics.mean(s[0] for s in samples)
+    rss = max(s[1] for s in samples) / 2**20
+    threads = max(s[2] for s in samples)
+    print(f"| {label} | {viewers} | {cpu:.1f}% | {rss:.0f} MiB | {threads} |")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='MJPEG viewer load test')
+    parser.add_argument('url')
+    parser.add_argument('--pid', type=int, required=True, help='Server process to sample')
+    parser.add_argument('--viewers', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to sample with all viewers connected')
+    parser.add_argument('--read', action='store_true', help='Keep reading frames instead of idling')
+    args = parser.parse_args()
+
+    process = psutil.Process(args.pid)
+    print(f"{args.url}: {args.viewers} {'reading' if args.read else 'idle'} viewers\n")
+    print("| Phase | Viewers | CPU | Peak RSS | Threads |")
+    print("|-------|---------|-----|----------|---------|")
+    row('baseline', 0, await sample(process, 5))
+
+    stop = asyncio.Event()
+    connected = []
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None)) as session:
+        tasks = [asyncio.create_task(viewer(session, args.url, args.read, connected, stop))
+                 for _ in range(args.viewers)]
+        # Give every viewer time to receive its first frame
+        for _ in range(60):
+            if len(connected) >= args.viewers:
+                break
+            await asyncio.sleep(0.5)
+        row('connected', len(connected), await sample(process, args.duration))
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    row('after disconnect', 0, await sample(process, 5))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+# prefilter_recall.py
+# Recall of the flame colour pre-filter on the D-Fire validation split.
+# Stills carry no motion, so only the colour stage is measured here; the
+# flicker stage can only reject more frames once it has a history.
+#
+# Usage (from backend/):
+#   python benchmarks/prefilter_recall.py --data ../detection_models/yolo_models/data
+import argparse
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config  # noqa: E402
+from prefilter import FlamePrefilter  # noqa: E402
+
+# D-Fire class ids (dataset.yaml)
+SMOKE_CLASS = 0
+FIRE_CLASS = 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flame pre-filter recall on D-Fire')
+    parser.add_argument('--data', default='../detection_models/yolo_models/data', help='D-Fire root with <split>/images and <split>/labels')
+    parser.add_argument('--split', default='val')
+    parser.add_argument('--limit', type=int, default=0, help='Only use the first N images (0 = all)')
+    parser.add_argument('--thresholds', type=float, nargs='+',
+                        default=[0.0001, 0.0005, 0.001, 0.002, 0.005, Config.PREFILTER_MIN_FLAME])
+    args = parser.parse_args()
+
+    image_dir = os.path.join(args.data, args.split, 'images')
+    label_dir = os.path.join(args.data, args.split, 'labels')
+    names = sorted(os.listdir(image_dir))
+    if args.limit:
+        names = names[:args.limit]
+    if not names:
+        sys.exit(f"No images in {image_dir}")
+
+    prefilter = FlamePrefilter()
+    ratios, groups = [], []
+    for name in names:
+        frame = cv2.imread(os.path.join(image_dir, name))
+        if frame is None:
+            continue
+        label_path = os.path.join(label_dir, os.path.splitext(name)[0] + '.txt')
+        classes = set()
+        if os.path.exists(label_path):
+            with open(label_path) as f:
+                classes = {int(line.split()[0]) for line in f if line.strip()}
+        ratios.append(prefilter.flame_ratio(frame))
+        groups.append('fire' if FIRE_CLASS in classes else 'smoke only' if SMOKE_CLASS in classes else 'empty')
+
+    ratios, groups = np.array(ratios), np.array(groups)
+    counts = {group: int((groups == group).sum()) for group in ('fire', 'smoke only', 'empty')}
+    print(f"{len(ratios)} images from {image_dir}: "
+          + ", ".join(f"{count} {group}" for group, count in counts.items()) + "\n")
+    print("| min_flame | Fire recall | Smoke-only pass rate | Empty pass rate | Overall pass rate |")
+    print("|-----------|-------------|----------------------|-----------------|-------------------|")
+    for threshold in sorted(set(args.thresholds)):
+        passed = ratios >= threshold
+        rates = [passed[groups == group].mean() if counts[group] else float('nan')
+                 for group in ('fire', 'smoke only', 'empty')]
+        print(f"| {threshold:.4f} | {rates[0]:.3f} | {rates[1]:.3f} | {rates[2]:.3f} | {passed.mean():.3f} |")
+
+
+if __name__ == '__main__':
+    main()
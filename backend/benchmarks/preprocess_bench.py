@@ -0,0 +1,72 @@
+# preprocess_bench.py
+# Per-frame preprocessing time before and after the single-pass Preprocessor.
+#
+#   before (background.py): cv2.resize to 480x272, then ultralytics letterbox + normalise
+#   before (app.py):        ultralytics letterbox + normalise on the full frame
+#   after:                  one resize/letterbox straight into a reused input buffer
+#
+# Usage (from backend/):
+#   python benchmarks/preprocess_bench.py --iterations 500
+#   python benchmarks/preprocess_bench.py --image some_cctv_frame.jpg
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocess import Preprocessor  # noqa: E402
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '2K': (2560, 1440), '4K': (3840, 2160)}
+
+
+def ultralytics_preprocess(frame, imgsz):
+    """What the ultralytics predictor does to a numpy frame before the forward pass."""
+    from ultralytics.data.augment import LetterBox
+
+    padded = LetterBox((imgsz, imgsz), auto=True, stride=32)(image=frame)
+    tensor = np.stack([padded])[..., ::-1].transpose((0, 3, 1, 2))
+    tensor = np.ascontiguousarray(tensor)
+    return tensor.astype(np.float32) / 255.0
+
+
+def time_per_frame(fn, frame, iterations):
+    for _ in range(10):
+        fn(frame)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(frame)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark frame preprocessing')
+    parser.add_argument('--image', help='Frame to use; random noise at each resolution otherwise')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.image:
+        frame = cv2.imread(args.image)
+        if frame is None:
+            sys.exit(f"Cannot read {args.image}")
+        frames = {f"{frame.shape[1]}x{frame.shape[0]}": frame}
+    else:
+        frames = {name: rng.integers(0, 256, (h, w, 3), dtype=np.uint8) for name, (w, h) in RESOLUTIONS.items()}
+
+    preprocess = Preprocessor(args.imgsz, rect=True)
+    print("| Frame | background.py before | app.py before | single pass | speedup vs app.py |")
+    print("|-------|----------------------|---------------|-------------|-------------------|")
+    for name, frame in frames.items():
+        background = time_per_frame(
+            lambda f: ultralytics_preprocess(cv2.resize(f, (480, 272)), args.imgsz), frame, args.iterations)
+        app = time_per_frame(lambda f: ultralytics_preprocess(f, args.imgsz), frame, args.iterations)
+        single = time_per_frame(lambda f: preprocess([f]), frame, args.iterations)
+        print(f"| {name} | {background:.2f} ms | {app:.2f} ms | {single:.2f} ms | {app / single:.1f}x |")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+# capture.py
+import logging
+import threading
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_BACKENDS = ('opencv', 'pyav')
+
+
+def transport_url(url, transport='udp'):
+    # OpenCV's FFmpeg backend takes the RTSP transport as a URL option
+    if not url.startswith("rtsp://"):
+        return url
+    if "?" not in url:
+        return url + f"?transport={transport}"
+    if "transport=" not in url:
+        return url + f"&transport={transport}"
+    return url
+
+
+class LatestFrameCapture:
+    """
+    Decodes a stream continuously on its own thread and keeps only the newest
+    frame, with its capture timestamp, in a single-slot mailbox. A consumer
+    slower than the camera always gets the freshest frame instead of the
+    decoder's backlog; frames replaced before anyone read them are counted as
+    dropped. The thread reconnects with backoff when the stream fails. Has
+    the isOpened/read/release interface of cv2.VideoCapture.
+    """
+    def __init__(self, url, transport=None, timeout=5.0):
+        self.url = url
+        self.transport = transport
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._frame = None
+        self._frame_time = 0.0
+        self._pending = False
+        self.timestamp = 0.0
+        self.decoded = 0
+        self.frames = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"capture-{url}", daemon=True)
+        self.thread.start()
+
+    def _open(self):
+        url = transport_url(self.url, self.transport) if self.transport else self.url
+        self.cap = cv2.VideoCapture(url)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return self.cap.isOpened()
+
+    def _decode(self):
+        ok, frame = self.cap.read()
+        return frame if ok else None
+
+    def _close(self):
+        self.cap.release()
+
+    def _publish(self, frame, timestamp):
+        with self._condition:
+            if self._pending:
+                self.dropped += 1
+            self._frame, self._frame_time, self._pending = frame, timestamp, True
+            self.decoded += 1
+            self._condition.notify_all()
+
+    def _run(self):
+        attempts = 0
+        while self.running:
+            logger.info(f"Connecting to stream: {self.url}")
+            try:
+                opened = self._open()
+            except Exception as e:
+                logger.error(f"Failed to open {self.url}: {e}")
+                opened = False
+            if not opened:
+                attempts += 1
+                logger.warning(f"Failed to connect to {self.url} (attempt {attempts})")
+                time.sleep(min(attempts, 5))
+                continue
+            attempts = 0
+
+            try:
+                while self.running:
+                    frame = self._decode()
+                    if frame is None:
+                        logger.warning(f"Failed to read frame from {self.url}")
+                        break
+                    self._publish(frame, time.time())
+            except Exception as e:
+                logger.error(f"Decoding {self.url} failed: {e}")
+            finally:
+                self._close()
+            if self.running:
+                self.reconnects += 1
+                time.sleep(1)
+
+    def isOpened(self):
+        return self.running
+
+    def read(self):
+        # Waits for a frame newer than the last one returned; the decoder never writes into it again
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending or not self.running, self.timeout)
+            if not self._pending:
+                return False, None
+            self._pending = False
+            self.frames += 1
+            self.timestamp = self._frame_time
+            return True, self._frame
+
+    def release(self):
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()
+        # The thread closes the decoder once its current read returns
+        if self.thread is not threading.current_thread():
+            self.thread.join(self.timeout)
+
+
+class PyAVCapture(LatestFrameCapture):
+    """
+    LatestFrameCapture on PyAV/FFmpeg. Decodes with FFmpeg's frame/slice
+    threads, lets swscale downscale to size (long side) during the pixel
+    format conversion, and can decode keyframes only while a feed idles;
+    full decoding resumes at the next keyframe, so no delta frame is shown
+    without its references.
+    """
+    def __init__(self, url, transport=None, timeout=5.0, size=None, threads=0):
+        self.size = size
+        self.threads = threads
+        # Read by the decode thread before each packet; switching needs no reconnect
+        self.keyframes_only = False
+        self._skipping = False
+        self._await_keyframe = False
+        super().__init__(url, transport, timeout)
+
+    def _open(self):
+        import av
+
+        options = {'fflags': 'nobuffer', 'flags': 'low_delay'}
+        if self.transport and self.url.startswith("rtsp://"):
+            options['rtsp_transport'] = self.transport
+        self.container = av.open(self.url, options=options, timeout=self.timeout)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'
+        self.stream.codec_context.thread_count = self.threads
+        self._skipping = False
+        self._await_keyframe = False
+        self._frames = self.container.decode(self.stream)
+        return True
+
+    def _output_size(self, width, height):
+        if not self.size or max(width, height) <= self.size:
+            return width, height
+        ratio = self.size / max(width, height)
+        # Even dimensions keep swscale on its fast paths
+        return max(2, int(width * ratio) // 2 * 2), max(2, int(height * ratio) // 2 * 2)
+
+    def _decode(self):
+        if self.keyframes_only != self._skipping:
+            self._skipping = self.keyframes_only
+            self.stream.codec_context.skip_frame = 'NONKEY' if self._skipping else 'DEFAULT'
+            # Delta frames right after keyframe-only decoding reference frames that were never decoded
+            self._await_keyframe = not self._skipping
+        while True:
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            if not self._await_keyframe or frame.key_frame:
+                break
+        self._await_keyframe = False
+        width, height = self._output_size(frame.width, frame.height)
+        return frame.to_ndarray(width=width, height=height, format='bgr24')
+
+    def _close(self):
+        self.container.close()
+
+
+def open_capture(url, backend='opencv', transport=None, size=None, threads=0):
+    if backend not in CAPTURE_BACKENDS:
+        raise ValueError(f"Unknown capture backend '{backend}', expected one of {CAPTURE_BACKENDS}")
+    if backend == 'pyav':
+        return PyAVCapture(url, transport, size=size, threads=threads)
+    return LatestFrameCapture(url, transport)
@@ -7,4 +7,88 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///firesafe.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Detection model weights, relative to the backend directory
+    FIRE_MODEL_PATH = os.getenv('FIRE_MODEL_PATH', '../detection_models/yolo_models/baseline_11.pt')
+    PERSON_MODEL_PATH = os.getenv('PERSON_MODEL_PATH', '../detection_models/yolo_models/baseline_11_p.pt')
+    COMBINED_MODEL_PATH = os.getenv('COMBINED_MODEL_PATH', '../detection_models/yolo_models/baseline_11_both.pt')
+    # Inference backend: 'torch', 'onnx' or 'openvino' (see export_models.py)
+    DETECTOR_BACKEND = os.getenv('DETECTOR_BACKEND', 'torch').lower()
+    # 'fp32' or 'int8' (onnx/openvino only, see quantize_models.py)
+    DETECTOR_PRECISION = os.getenv('DETECTOR_PRECISION', 'fp32').lower()
+    # Defaults to CUDA when available for torch and CPU otherwise
+    DETECTOR_DEVICE = os.getenv('DETECTOR_DEVICE')
+    # 'separate' (fire model + person model) or 'unified' (combined model, one pass per frame)
+    DETECTOR_MODE = os.getenv('DETECTOR_MODE', 'separate').lower()
+    # Intra-op threads per inference backend; 0 keeps the library default
+    DETECTOR_THREADS = int(os.getenv('DETECTOR_THREADS', '0'))
+
+    # Worker processes running the feed detectors; 0 runs them as threads in this process
+    DETECTION_WORKERS = int(os.getenv('DETECTION_WORKERS', '0'))
+
+    # Serve /mjpeg from the API process; disable when streaming.py runs as its own service
+    SERVE_STREAMS = os.getenv('SERVE_STREAMS', 'true').lower() == 'true'
+
+    # MJPEG defaults; viewers can pass ?quality= and ?fps=
+    MJPEG_QUALITY = int(os.getenv('MJPEG_QUALITY', '50'))
+    MJPEG_MAX_FPS = float(os.getenv('MJPEG_MAX_FPS', '15'))
+
+    # Model passes per second on viewer streams; frames in between reuse the last detections (0: every frame)
+    DISPLAY_INFERENCE_FPS = float(os.getenv('DISPLAY_INFERENCE_FPS', '0'))
+
+    # Seconds a stream ingest without viewers stays open before it is torn down
+    INGEST_IDLE_TIMEOUT = float(os.getenv('INGEST_IDLE_TIMEOUT', '30'))
+
+    # Probe new feeds for a low-resolution substream to run detection on
+    SUBSTREAM_DISCOVERY = os.getenv('SUBSTREAM_DISCOVERY', 'true').lower() == 'true'
+
+    # Stream decoder: 'opencv' or 'pyav' (threaded FFmpeg decode, scaled to the model input)
+    CAPTURE_BACKEND = os.getenv('CAPTURE_BACKEND', 'opencv').lower()
+    CAPTURE_THREADS = int(os.getenv('CAPTURE_THREADS', '0'))
+    # pyav only: decode keyframes only while a feed samples at the idle rate
+    KEYFRAME_IDLE = os.getenv('KEYFRAME_IDLE', 'false').lower() == 'true'
+
+    # Decode each feed once in a capture process and share frames through memory
+    SHARED_FRAMES = os.getenv('SHARED_FRAMES', 'false').lower() == 'true'
+    FRAME_RING_SLOTS = int(os.getenv('FRAME_RING_SLOTS', '4'))
+
+    # Cross-feed batched inference for the background detector
+    BATCH_INFERENCE = os.getenv('BATCH_INFERENCE', 'false').lower() == 'true'
+    BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', '8'))
+    BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', '50'))
+
+    # Motion gating: skip inference while the scene is static
+    MOTION_GATING = os.getenv('MOTION_GATING', 'false').lower() == 'true'
+    MOTION_THRESHOLD = float(os.getenv('MOTION_THRESHOLD', '0.002'))
+    MOTION_MAX_IDLE = float(os.getenv('MOTION_MAX_IDLE', '5'))
+    MOTION_CROP = os.getenv('MOTION_CROP', 'false').lower() == 'true'
+
+    # Adaptive per-feed sampling rate driven by the alarm state
+    ADAPTIVE_RATE = os.getenv('ADAPTIVE_RATE', 'false').lower() == 'true'
+    IDLE_FPS = float(os.getenv('IDLE_FPS', '1.5'))
+    SUSPECT_FPS = float(os.getenv('SUSPECT_FPS', '8'))
+    ALARM_FPS = float(os.getenv('ALARM_FPS', '15'))
+    # Fire/smoke confidence that switches a feed to the suspect rate
+    SUSPICION_CONF = float(os.getenv('SUSPICION_CONF', '0.3'))
+
+    # Tiled inference at full resolution over the feed's ROI
+    TILED_INFERENCE = os.getenv('TILED_INFERENCE', 'false').lower() == 'true'
+    TILE_OVERLAP = float(os.getenv('TILE_OVERLAP', '0.2'))
+
+    # Fire/smoke tracking: confirm by track age and coast between inferences
+    TRACKING = os.getenv('TRACKING', 'false').lower() == 'true'
+    TRACK_MAX_COAST = float(os.getenv('TRACK_MAX_COAST', '1.5'))
+    TRACK_COAST_INTERVAL = float(os.getenv('TRACK_COAST_INTERVAL', '0.5'))
+
+    # Colour/flicker pre-filter cascade ahead of the fire model
+    PREFILTER = os.getenv('PREFILTER', 'false').lower() == 'true'
+    # Minimum fraction of flame-coloured pixels in the downsampled frame
+    PREFILTER_MIN_FLAME = float(os.getenv('PREFILTER_MIN_FLAME', '0.0005'))
+    # Minimum mean state changes per flame-coloured pixel across the history
+    PREFILTER_MIN_FLICKER = float(os.getenv('PREFILTER_MIN_FLICKER', '0.02'))
+
+    # Multi-resolution cascade: low-res pass first, full resolution on suspicion
+    CASCADE = os.getenv('CASCADE', 'false').lower() == 'true'
+    CASCADE_LOW_SIZE = int(os.getenv('CASCADE_LOW_SIZE', '320'))
+    CASCADE_ESCALATE_CONF = float(os.getenv('CASCADE_ESCALATE_CONF', '0.15'))
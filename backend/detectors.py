@@ -0,0 +1,278 @@
+# detectors.py
+import ast
+import glob
+import logging
+import os
+
+import cv2
+import numpy as np
+
+from preprocess import Preprocessor
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+PRECISIONS = ('fp32', 'int8')
+
+
+class Detections:
+    """
+    Boxes for one frame in original frame coordinates.
+    xyxy is (N, 4) float32, conf is (N,) float32, cls is (N,) int32.
+    """
+    __slots__ = ('xyxy', 'conf', 'cls', 'names')
+
+    def __init__(self, xyxy, conf, cls, names):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+
+    @classmethod
+    def empty(cls, names):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32), names)
+
+    def __len__(self):
+        return len(self.conf)
+
+    def select(self, keep):
+        """Subset by boolean mask or index array."""
+        return Detections(self.xyxy[keep], self.conf[keep], self.cls[keep], self.names)
+
+    def shifted(self, dx, dy):
+        """Boxes moved by (dx, dy), e.g. from crop to full-frame coordinates."""
+        return Detections(self.xyxy + np.array([dx, dy, dx, dy], np.float32), self.conf, self.cls, self.names)
+
+
+class Detector:
+    """
+    Common interface over the inference backends. predict() takes a list of
+    BGR frames and returns one Detections per frame; calling the detector
+    with a single frame returns its Detections. imgsz and conf can be
+    overridden per call, e.g. for a low-resolution first pass.
+    """
+    backend = None
+    # Whether predict() may be called from several threads at once
+    thread_safe = False
+    # Whether the input size can change between calls
+    dynamic_size = True
+    # Pad only to the stride instead of a full square (see Preprocessor)
+    rect = False
+
+    def __init__(self, path, device='cpu', imgsz=640, conf=0.25, iou=0.7):
+        self.path = path
+        self.device = device
+        self.imgsz = imgsz
+        self.conf = conf
+        # ultralytics' default NMS IoU, which the torch path always ran with; exported graphs use it too
+        self.iou = iou
+        self.names = {}
+        self._preprocessors = {}
+
+    def preprocessor(self, imgsz=None):
+        imgsz = imgsz or self.imgsz
+        if imgsz != self.imgsz and not self.dynamic_size:
+            raise ValueError(f"{self.path} has a fixed {self.imgsz}px input; export it with --dynamic "
+                             f"to run at {imgsz}px")
+        if imgsz not in self._preprocessors:
+            self._preprocessors[imgsz] = Preprocessor(imgsz, rect=self.rect)
+        return self._preprocessors[imgsz]
+
+    def predict(self, frames, imgsz=None, conf=None):
+        raise NotImplementedError
+
+    def weight_bytes(self):
+        if os.path.isdir(self.path):
+            return sum(os.path.getsize(p) for p in glob.glob(os.path.join(self.path, '*')))
+        return os.path.getsize(self.path)
+
+    def __call__(self, frame, imgsz=None, conf=None):
+        return self.predict([frame], imgsz, conf)[0]
+
+
+class TorchDetector(Detector):
+    backend = 'torch'
+    # PyTorch takes any stride-aligned shape
+    rect = True
+
+    def __init__(self, path, device=None, threads=0, **kwargs):
+        import torch
+        from ultralytics import YOLO
+
+        device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        super().__init__(path, device, **kwargs)
+        if threads:
+            # Process-wide intra-op pool; detection workers size it to their share of the cores
+            torch.set_num_threads(threads)
+        self.torch = torch
+        self.model = YOLO(path)
+        self.model.to(device)
+        self.names = self.model.names
+
+    def weight_bytes(self):
+        return sum(p.numel() * p.element_size() for p in self.model.model.parameters())
+
+    def predict(self, frames, imgsz=None, conf=None):
+        if not frames:
+            return []
+        # A ready tensor skips ultralytics' own letterbox, so each frame is resized exactly once
+        tensor, transforms = self.preprocessor(imgsz)(frames)
+        results = self.model(self.torch.from_numpy(tensor), conf=conf or self.conf, iou=self.iou, verbose=False)
+        detections = []
+        for result, transform in zip(results, transforms):
+            boxes = result.boxes
+            detections.append(Detections(
+                transform.to_frame(boxes.xyxy.cpu().numpy().astype(np.float32)),
+                boxes.conf.cpu().numpy().astype(np.float32),
+                boxes.cls.cpu().numpy().astype(np.int32),
+                self.names,
+            ))
+        return detections
+
+
+class ExportedDetector(Detector):
+    """
+    Shared pre/post-processing for exported YOLO graphs, whose single output
+    is (batch, 4 + num_classes, anchors) with cx, cy, w, h in input pixels.
+    """
+    # Fixed batch size of the exported graph, or None when dynamic
+    batch_size = None
+
+    def _infer(self, batch):
+        raise NotImplementedError
+
+    def predict(self, frames, imgsz=None, conf=None):
+        if not frames:
+            return []
+        if self.batch_size and len(frames) > self.batch_size:
+            detections = []
+            for start in range(0, len(frames), self.batch_size):
+                detections.extend(self.predict(frames[start:start + self.batch_size], imgsz, conf))
+            return detections
+
+        batch, transforms = self.preprocessor(imgsz)(frames, batch=self.batch_size)
+        output = self._infer(batch)
+        return [self._postprocess(output[i], transforms[i], conf or self.conf) for i in range(len(frames))]
+
+    def _postprocess(self, pred, transform, min_conf):
+        pred = pred.T  # (anchors, 4 + num_classes)
+        scores = pred[:, 4:]
+        cls = scores.argmax(1)
+        conf = scores[np.arange(len(cls)), cls]
+        keep = conf > min_conf
+        if not keep.any():
+            return Detections.empty(self.names)
+        boxes, conf, cls = pred[keep, :4], conf[keep], cls[keep]
+
+        xywh = boxes.copy()
+        xywh[:, :2] -= xywh[:, 2:] / 2
+        indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), conf.tolist(), cls.tolist(), min_conf, self.iou)
+        indices = np.array(indices, dtype=np.int64).reshape(-1)
+        indices = indices[np.argsort(-conf[indices])]
+
+        xyxy = np.concatenate([xywh[indices, :2], xywh[indices, :2] + xywh[indices, 2:]], axis=1)
+        return Detections(transform.to_frame(xyxy.astype(np.float32)), conf[indices].astype(np.float32),
+                          cls[indices].astype(np.int32), self.names)
+
+
+class OnnxDetector(ExportedDetector):
+    backend = 'onnx'
+    thread_safe = True
+
+    def __init__(self, path, device=None, threads=0, **kwargs):
+        import onnxruntime as ort
+
+        super().__init__(path, device or 'cpu', **kwargs)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        providers = ['CPUExecutionProvider']
+        if self.device.startswith('cuda'):
+            providers.insert(0, 'CUDAExecutionProvider')
+        self.session = ort.InferenceSession(path, options, providers=providers)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        if isinstance(model_input.shape[0], int):
+            self.batch_size = model_input.shape[0]
+        if isinstance(model_input.shape[2], int):
+            self.imgsz = model_input.shape[2]
+            self.dynamic_size = False
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata['names']) if 'names' in metadata else {}
+
+    def _infer(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINODetector(ExportedDetector):
+    backend = 'openvino'
+
+    def __init__(self, path, device=None, threads=0, **kwargs):
+        import openvino as ov
+        import yaml
+
+        super().__init__(path, device or 'CPU', **kwargs)
+        xml_path = path
+        if os.path.isdir(path):
+            xml_path = glob.glob(os.path.join(path, '*.xml'))[0]
+            metadata_path = os.path.join(path, 'metadata.yaml')
+            if os.path.exists(metadata_path):
+                with open(metadata_path) as f:
+                    self.names = yaml.safe_load(f).get('names', {})
+
+        core = ov.Core()
+        model = core.read_model(xml_path)
+        model_input = model.input(0).get_partial_shape()
+        if model_input[0].is_static:
+            self.batch_size = model_input[0].get_length()
+        if model_input[2].is_static:
+            self.imgsz = model_input[2].get_length()
+            self.dynamic_size = False
+        properties = {'PERFORMANCE_HINT': 'LATENCY'}
+        if threads:
+            properties['INFERENCE_NUM_THREADS'] = threads
+        self.compiled = core.compile_model(model, self.device.upper(), properties)
+
+    def _infer(self, batch):
+        return self.compiled(batch)[self.compiled.output(0)]
+
+
+DETECTOR_CLASSES = {
+    'torch': TorchDetector,
+    'onnx': OnnxDetector,
+    'openvino': OpenVINODetector,
+}
+
+
+def resolve_weights(path, backend, precision='fp32'):
+    """
+    Map the configured .pt weights to the file exported for a backend, using
+    the names ultralytics' exporter (and quantize_models.py for int8) writes
+    next to the .pt file.
+    """
+    stem, ext = os.path.splitext(path)
+    if ext != '.pt':
+        return path
+    if precision == 'int8':
+        stem += '_int8'
+    if backend == 'onnx':
+        return stem + '.onnx'
+    if backend == 'openvino':
+        return stem + '_openvino_model'
+    return path
+
+
+def create_detector(path, backend='torch', device=None, precision='fp32', **kwargs):
+    if backend not in DETECTOR_CLASSES:
+        raise ValueError(f"Unknown detector backend '{backend}', expected one of {BACKENDS}")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+    if precision == 'int8' and backend == 'torch':
+        raise ValueError("int8 models need the onnx or openvino backend")
+    weights = resolve_weights(path, backend, precision)
+    if not os.path.exists(weights):
+        script = 'quantize_models.py' if precision == 'int8' else 'export_models.py'
+        raise FileNotFoundError(f"No {backend} {precision} weights at {weights}; run {script} first")
+    logger.info(f"Loading {backend} {precision} detector from {weights}")
+    return DETECTOR_CLASSES[backend](weights, device=device, **kwargs)
@@ -0,0 +1,129 @@
+# export_models.py
+# Export the configured .pt weights to ONNX / OpenVINO IR next to the
+# originals, and optionally check that every backend agrees with PyTorch.
+#
+# Usage (from backend/):
+#   python export_models.py                              # all configured weights, all formats
+#   python export_models.py --formats onnx --weights ../detection_models/yolo_models/baseline_11.pt
+#   python export_models.py --check ../detection_models/yolo_models/merged_dataset/images/val
+import argparse
+import glob
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from config import Config
+from detectors import create_detector
+
+EXPORT_FORMATS = ('onnx', 'openvino')
+
+
+def export(weights, fmt, imgsz, dynamic):
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    kwargs = {'format': fmt, 'imgsz': imgsz, 'dynamic': dynamic}
+    if fmt == 'onnx':
+        kwargs['simplify'] = True
+    path = model.export(**kwargs)
+    print(f"Exported {weights} -> {path}")
+    return path
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def compare(reference, candidate, min_conf, iou_threshold, conf_tolerance):
+    """
+    Greedily match candidate boxes to reference boxes of the same class.
+    Returns (matched, unmatched, worst confidence difference) for boxes
+    above min_conf in either set.
+    """
+    ref_keep, cand_keep = reference.conf >= min_conf, candidate.conf >= min_conf
+    ref_boxes, ref_conf, ref_cls = reference.xyxy[ref_keep], reference.conf[ref_keep], reference.cls[ref_keep]
+    cand_boxes, cand_conf, cand_cls = candidate.xyxy[cand_keep], candidate.conf[cand_keep], candidate.cls[cand_keep]
+    if not len(ref_boxes) or not len(cand_boxes):
+        return 0, len(ref_boxes) + len(cand_boxes), 0.0
+
+    iou = box_iou(ref_boxes, cand_boxes)
+    iou[ref_cls[:, None] != cand_cls[None, :]] = 0
+    matched, worst = 0, 0.0
+    used = set()
+    for i in np.argsort(-ref_conf):
+        j = int(iou[i].argmax())
+        if iou[i, j] >= iou_threshold and j not in used:
+            used.add(j)
+            diff = abs(float(ref_conf[i]) - float(cand_conf[j]))
+            if diff <= conf_tolerance:
+                matched += 1
+            worst = max(worst, diff)
+    unmatched = len(ref_boxes) + len(cand_boxes) - 2 * matched
+    return matched, unmatched, worst
+
+
+def check_parity(weights, formats, images, min_conf, iou_threshold, conf_tolerance):
+    reference = create_detector(weights, 'torch', 'cpu')
+    ok = True
+    for fmt in formats:
+        candidate = create_detector(weights, fmt)
+        matched = unmatched = 0
+        worst = 0.0
+        for image_path in images:
+            frame = cv2.imread(image_path)
+            if frame is None:
+                continue
+            m, u, w = compare(reference(frame), candidate(frame), min_conf, iou_threshold, conf_tolerance)
+            matched += m
+            unmatched += u
+            worst = max(worst, w)
+        total = matched + unmatched
+        agreement = matched / total if total else 1.0
+        passed = agreement >= 0.95
+        ok = ok and passed
+        print(f"{'PASS' if passed else 'FAIL'} {weights} torch vs {fmt}: "
+              f"{matched}/{total} boxes agree ({agreement:.1%}), worst score diff {worst:.3f}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export detection weights and check backend parity')
+    parser.add_argument('--weights', nargs='+',
+                        default=[Config.FIRE_MODEL_PATH, Config.PERSON_MODEL_PATH, Config.COMBINED_MODEL_PATH])
+    parser.add_argument('--formats', nargs='+', choices=EXPORT_FORMATS, default=list(EXPORT_FORMATS))
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--dynamic', action='store_true',
+                        help='Dynamic batch/shape export, needed for batched inference on exported graphs')
+    parser.add_argument('--skip-export', action='store_true', help='Only run the parity check')
+    parser.add_argument('--check', metavar='IMAGE_DIR', help='Compare every backend against PyTorch on these images')
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--min-conf', type=float, default=0.4)
+    parser.add_argument('--iou', type=float, default=0.9)
+    parser.add_argument('--conf-tolerance', type=float, default=0.05)
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        for weights in args.weights:
+            for fmt in args.formats:
+                export(weights, fmt, args.imgsz, args.dynamic)
+
+    if args.check:
+        images = sorted(glob.glob(os.path.join(args.check, '*.jpg')) +
+                        glob.glob(os.path.join(args.check, '*.png')))[:args.limit]
+        if not images:
+            sys.exit(f"No images found in {args.check}")
+        ok = all([check_parity(weights, args.formats, images, args.min_conf, args.iou, args.conf_tolerance)
+                  for weights in args.weights])
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+# frame_ring.py
+import hashlib
+import json
+import logging
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Header fields (int64) at the start of the segment
+_MAGIC, _HEIGHT, _WIDTH, _CHANNELS, _SLOTS, _LATEST, _CLOSED = range(7)
+_HEADER_FIELDS = 8
+_MAGIC_VALUE = 0x46524E47  # 'FRNG'
+_ALIGN = 64
+
+
+def ring_name(url):
+    """Shared-memory name of the ring carrying a stream, the same in every process."""
+    return "firesafe_" + hashlib.sha1(url.encode()).hexdigest()[:16]
+
+
+def _layout(shape, slots):
+    # header | per-slot sequence numbers | per-slot timestamps | frames, frames cache-line aligned
+    seq_offset = _HEADER_FIELDS * 8
+    ts_offset = seq_offset + slots * 8
+    frame_offset = -(-(ts_offset + slots * 8) // _ALIGN) * _ALIGN
+    return seq_offset, ts_offset, frame_offset, frame_offset + slots * int(np.prod(shape))
+
+
+def _attach(name):
+    # Readers must not let the resource tracker unlink the writer's segment when they exit
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class FrameRing:
+    """
+    Fixed-size ring of decoded BGR frames in one shared-memory segment.
+
+    A single writer fills slot n % slots for frame n; readers get NumPy views
+    of the slots, so frames cross processes without pickling or copying.
+    Each slot carries a seqlock-style sequence number: 2n - 1 while frame n
+    is being written and 2n once it is complete. A reader only uses a slot
+    whose number is even and matches the frame it asked for, and can check
+    the same token afterwards to learn whether the writer lapped it.
+    """
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self.meta = np.ndarray((_HEADER_FIELDS,), np.int64, buffer=shm.buf)
+        self.shape = (int(self.meta[_HEIGHT]), int(self.meta[_WIDTH]), int(self.meta[_CHANNELS]))
+        self.slots = int(self.meta[_SLOTS])
+        seq_offset, ts_offset, frame_offset, _ = _layout(self.shape, self.slots)
+        self.seq = np.ndarray((self.slots,), np.int64, buffer=shm.buf, offset=seq_offset)
+        self.timestamps = np.ndarray((self.slots,), np.float64, buffer=shm.buf, offset=ts_offset)
+        self.frames = np.ndarray((self.slots, *self.shape), np.uint8, buffer=shm.buf, offset=frame_offset)
+
+    @classmethod
+    def create(cls, name, shape, slots=4):
+        _, _, _, size = _layout(shape, slots)
+        try:
+            # Left behind by a capture process that died without cleaning up
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        meta = np.ndarray((_HEADER_FIELDS,), np.int64, buffer=shm.buf)
+        meta[:] = 0
+        meta[_HEIGHT], meta[_WIDTH], meta[_CHANNELS] = shape
+        meta[_SLOTS] = slots
+        # Written last: readers ignore the segment until the header is complete
+        meta[_MAGIC] = _MAGIC_VALUE
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        shm = _attach(name)
+        if int(np.frombuffer(shm.buf, np.int64, count=1)[0]) != _MAGIC_VALUE:
+            shm.close()
+            raise ValueError(f"Shared memory {name} is not a ready frame ring")
+        return cls(shm)
+
+    @property
+    def latest(self):
+        return int(self.meta[_LATEST])
+
+    @property
+    def closed(self):
+        return bool(self.meta[_CLOSED])
+
+    def begin_write(self):
+        """Mark the next slot as being written and return (frame number, slot view)."""
+        n = self.latest + 1
+        slot = n % self.slots
+        self.seq[slot] = 2 * n - 1
+        return n, self.frames[slot]
+
+    def end_write(self, n, timestamp):
+        slot = n % self.slots
+        self.timestamps[slot] = timestamp
+        self.seq[slot] = 2 * n
+        self.meta[_LATEST] = n
+
+    def write(self, frame, timestamp):
+        n, view = self.begin_write()
+        view[...] = frame
+        self.end_write(n, timestamp)
+
+    def read(self, n=None):
+        """
+        View of frame n (default: the newest) as (frame, timestamp, token),
+        or None when that frame has been overwritten or is still being written.
+        """
+        n = self.latest if n is None else n
+        if n == 0:
+            return None
+        slot = n % self.slots
+        if self.seq[slot] != 2 * n:
+            return None
+        frame, timestamp = self.frames[slot], float(self.timestamps[slot])
+        # Re-check after reading the timestamp, which the writer updates before publishing
+        if self.seq[slot] != 2 * n:
+            return None
+        return frame, timestamp, (slot, 2 * n)
+
+    def valid(self, token):
+        """Whether the slot behind a view returned by read() still holds that frame."""
+        slot, seq = token
+        return self.seq[slot] == seq
+
+    def close(self):
+        if self.owner:
+            self.meta[_CLOSED] = 1
+        # Views must be dropped before the mapping can be closed
+        self.meta = self.seq = self.timestamps = self.frames = None
+        if self.owner:
+            self.shm.unlink()
+        try:
+            self.shm.close()
+        except BufferError:
+            # A consumer still holds a frame view; the mapping goes away with it
+            pass
+
+
+class RingReader:
+    """
+    Frame source backed by a FrameRing, with the isOpened/read/release
+    interface of cv2.VideoCapture. read() waits for a frame newer than the
+    last one returned and gives a view into shared memory; the view stays
+    valid until the writer laps the ring (slots - 1 frames later). A ring
+    that is closed or not published yet is (re-)attached on the next read.
+    """
+    def __init__(self, name, timeout=5.0, poll=0.002):
+        self.name = name
+        self.timeout = timeout
+        self.poll = poll
+        self.ring = None
+        self.last = 0
+        self.timestamp = 0.0
+        self.token = None
+        self.frames = 0
+        self.dropped = 0
+        self.torn = 0
+        self._attach()
+
+    def _attach(self):
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+        try:
+            self.ring = FrameRing.attach(self.name)
+            self.last = max(self.ring.latest - 1, 0)
+        except (FileNotFoundError, ValueError):
+            self.ring = None
+        return self.ring is not None
+
+    def isOpened(self):
+        return self.ring is not None and not self.ring.closed
+
+    def read(self):
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if not self.isOpened() and not self._attach():
+                # The capture process is (re)connecting
+                time.sleep(0.1)
+                continue
+            n = self.ring.latest
+            if n > self.last:
+                result = self.ring.read(n)
+                if result is None:
+                    # Lapped while checking; the next poll sees a newer frame
+                    self.torn += 1
+                    continue
+                self.dropped += n - self.last - 1
+                self.frames += 1
+                self.last = n
+                frame, self.timestamp, self.token = result
+                return True, frame
+            time.sleep(self.poll)
+        return False, None
+
+    def fresh(self):
+        """Whether the last frame returned by read() has not been overwritten since."""
+        return self.token is not None and self.ring is not None and self.ring.valid(self.token)
+
+    def release(self):
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+
+
+def board_name(url):
+    """Shared-memory name of the detection board of a stream."""
+    return ring_name(url) + "_det"
+
+
+# Board header fields (int64); the seqlock counter is odd while a result is being written
+_B_MAGIC, _B_SEQ, _B_COUNT, _B_WIDTH, _B_HEIGHT, _B_CLOSED, _B_NAMES, _B_GENERATION = range(8)
+_B_MAGIC_VALUE = 0x46444554  # 'FDET'
+_B_NAMES_BYTES = 4096
+# x1, y1, x2, y2, conf, class index per box
+_B_BOX_FIELDS = 6
+
+
+def _board_layout(max_boxes):
+    # header | frame timestamp, heartbeat | class names (JSON) | boxes
+    times_offset = _HEADER_FIELDS * 8
+    names_offset = times_offset + 2 * 8
+    boxes_offset = names_offset + _B_NAMES_BYTES
+    return times_offset, names_offset, boxes_offset, boxes_offset + max_boxes * _B_BOX_FIELDS * 4
+
+
+class DetectionBoard:
+    """
+    Latest detection result of one stream in shared memory, so viewers in
+    other processes draw the detection service's boxes instead of running
+    the model again. One writer; the result is guarded by a seqlock counter
+    and readers retry or keep their previous result while it changes. The
+    writer also beats a heartbeat on every frame it looks at, including the
+    ones it decides not to infer, so readers can tell a quiet scene from a
+    detector that has gone away.
+    """
+    def __init__(self, shm, owner=False, max_boxes=None):
+        self.shm = shm
+        self.owner = owner
+        self.meta = np.ndarray((_HEADER_FIELDS,), np.int64, buffer=shm.buf)
+        self.max_boxes = max_boxes or (shm.size - _board_layout(0)[3]) // (_B_BOX_FIELDS * 4)
+        times_offset, names_offset, boxes_offset, _ = _board_layout(self.max_boxes)
+        self.times = np.ndarray((2,), np.float64, buffer=shm.buf, offset=times_offset)
+        names = bytes(shm.buf[names_offset:names_offset + int(self.meta[_B_NAMES])])
+        self.names = {i: name for i, name in enumerate(json.loads(names or b'[]'))}
+        self.boxes = np.ndarray((self.max_boxes, _B_BOX_FIELDS), np.float32, buffer=shm.buf, offset=boxes_offset)
+
+    @classmethod
+    def create(cls, name, names, max_boxes=256):
+        times_offset, names_offset, _, size = _board_layout(max_boxes)
+        encoded = json.dumps(list(names)).encode()
+        if len(encoded) > _B_NAMES_BYTES:
+            raise ValueError(f"Class names of board {name} do not fit in {_B_NAMES_BYTES} bytes")
+        try:
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        meta = np.ndarray((_HEADER_FIELDS,), np.int64, buffer=shm.buf)
+        meta[:] = 0
+        shm.buf[names_offset:names_offset + len(encoded)] = encoded
+        meta[_B_NAMES] = len(encoded)
+        # Tells this writer's segment apart from a successor's of the same name on close
+        meta[_B_GENERATION] = int.from_bytes(os.urandom(7), 'little')
+        np.ndarray((2,), np.float64, buffer=shm.buf, offset=times_offset)[:] = 0.0
+        meta[_B_MAGIC] = _B_MAGIC_VALUE
+        return cls(shm, owner=True, max_boxes=max_boxes)
+
+    @classmethod
+    def attach(cls, name):
+        shm = _attach(name)
+        if int(np.frombuffer(shm.buf, np.int64, count=1)[0]) != _B_MAGIC_VALUE:
+            shm.close()
+            raise ValueError(f"Shared memory {name} is not a ready detection board")
+        return cls(shm)
+
+    @property
+    def closed(self):
+        return bool(self.meta[_B_CLOSED])
+
+    def beat(self):
+        self.times[1] = time.time()
+
+    def live(self, max_age=5.0):
+        return not self.closed and time.time() - self.times[1] < max_age
+
+    def write(self, timestamp, shape, boxes):
+        """Publish one frame's result: boxes is (N, 6) in the coordinates of a frame of this shape."""
+        count = min(len(boxes), self.max_boxes)
+        self.meta[_B_SEQ] += 1
+        self.boxes[:count] = boxes[:count]
+        self.meta[_B_COUNT] = count
+        self.meta[_B_HEIGHT], self.meta[_B_WIDTH] = shape[:2]
+        self.times[0] = timestamp
+        self.meta[_B_SEQ] += 1
+        self.beat()
+
+    def read(self):
+        """(seq, timestamp, (height, width), boxes copy) of the latest result, or None while it is written."""
+        seq = int(self.meta[_B_SEQ])
+        if seq == 0 or seq % 2:
+            return None
+        count = int(self.meta[_B_COUNT])
+        result = (seq, float(self.times[0]), (int(self.meta[_B_HEIGHT]), int(self.meta[_B_WIDTH])),
+                  self.boxes[:count].copy())
+        if int(self.meta[_B_SEQ]) != seq:
+            return None
+        return result
+
+    def close(self):
+        generation = int(self.meta[_B_GENERATION])
+        if self.owner:
+            self.meta[_B_CLOSED] = 1
+        self.meta = self.times = self.boxes = None
+        if self.owner:
+            # A restarted detector may already have replaced the segment under this name
+            try:
+                current = _attach(self.shm.name)
+                ours = int(np.frombuffer(current.buf, np.int64, count=_HEADER_FIELDS)[_B_GENERATION]) == generation
+                current.close()
+                if ours:
+                    self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+
+def _capture_main(name, url, slots, stop):
+    reconnect_attempts = 0
+    ring = None
+    while not stop.is_set():
+        cap = cv2.VideoCapture(url)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not cap.isOpened():
+            reconnect_attempts += 1
+            logger.warning(f"Capture for ring {name} failed to connect (attempt {reconnect_attempts})")
+            time.sleep(min(reconnect_attempts, 5))
+            continue
+        reconnect_attempts = 0
+
+        while not stop.is_set():
+            if not cap.grab():
+                logger.warning(f"Capture for ring {name} lost the stream")
+                break
+            timestamp = time.time()
+            if ring is None:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                ring = FrameRing.create(name, frame.shape, slots)
+                ring.write(frame, timestamp)
+                logger.info(f"Publishing {frame.shape[1]}x{frame.shape[0]} frames to ring {name}")
+                continue
+            # Decode straight into the slot; OpenCV reuses a destination of the right shape
+            n, view = ring.begin_write()
+            ok, frame = cap.retrieve(view)
+            if not ok:
+                break
+            if frame is not view and frame.shape != ring.shape:
+                # Resolution changed: readers see the ring close and re-attach to the new one
+                logger.info(f"Stream of ring {name} changed resolution, recreating it")
+                ring.close()
+                ring = None
+                continue
+            if frame is not view:
+                view[...] = frame
+            ring.end_write(n, timestamp)
+        cap.release()
+
+    if ring:
+        ring.close()
+
+
+class RingCapture:
+    """
+    Capture process decoding one stream into its FrameRing, so any number of
+    consumers in other processes read the same decoded frames.
+    """
+    def __init__(self, url, name, slots=4):
+        self.url = url
+        self.name = name
+        self.slots = slots
+        self._context = mp.get_context('spawn')
+        self._stop = None
+        self.process = None
+        self.restarts = 0
+
+    def start(self):
+        self._stop = self._context.Event()
+        self.process = self._context.Process(
+            target=_capture_main,
+            args=(self.name, self.url, self.slots, self._stop),
+            name=f"capture-{self.name}",
+            daemon=True,
+        )
+        self.process.start()
+        logger.info(f"Started capture process for ring {self.name} (pid {self.process.pid})")
+
+    def check(self):
+        if self.process and not self.process.is_alive() and not self._stop.is_set():
+            logger.error(f"Capture process for ring {self.name} died with exit code "
+                         f"{self.process.exitcode}, restarting it")
+            self.restarts += 1
+            self.start()
+
+    def stop(self, timeout=5):
+        if not self.process:
+            return
+        self._stop.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
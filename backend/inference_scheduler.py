@@ -0,0 +1,136 @@
+# inference_scheduler.py
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceScheduler:
+    """
+    Collects the latest frame from every registered feed and runs them through
+    one model as a single batched forward pass. A batch is dispatched once it
+    reaches max_batch_size, once every registered feed has a frame queued, or
+    when the oldest queued frame has waited max_wait seconds.
+
+    Sources are any hashable per-feed key (FireDetector passes itself, so a
+    restarted detector never collides with the one it replaces).
+    """
+    def __init__(self, model_path, max_batch_size=8, max_wait=0.05, stats_interval=60):
+        self.model = registry.acquire(model_path)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats_interval = stats_interval
+
+        self._cond = threading.Condition()
+        self._feeds = set()
+        self._pending = {}  # source -> (submitted_at, frame, future)
+        self.running = True
+
+        self._frames = 0
+        self._batches = 0
+        self._stats_start = time.time()
+
+    def register(self, source):
+        with self._cond:
+            self._feeds.add(source)
+
+    def unregister(self, source):
+        with self._cond:
+            self._feeds.discard(source)
+            pending = self._pending.pop(source, None)
+            self._cond.notify()
+        if pending:
+            pending[2].cancel()
+
+    def submit(self, source, frame):
+        """Queue a frame for the feed and return a Future resolving to its Detections."""
+        future = Future()
+        with self._cond:
+            if not self.running:
+                raise RuntimeError("Inference scheduler is stopped")
+            stale = self._pending.get(source)
+            self._pending[source] = (time.time(), frame, future)
+            self._cond.notify()
+        if stale:
+            # Only the newest frame per feed is worth inferring
+            stale[2].cancel()
+        return future
+
+    def _batch_ready(self, now):
+        if not self._pending:
+            return False
+        if len(self._pending) >= self.max_batch_size:
+            return True
+        if self._feeds and self._feeds.issubset(self._pending):
+            return True
+        oldest = min(submitted_at for submitted_at, _, _ in self._pending.values())
+        return now - oldest >= self.max_wait
+
+    def _next_batch(self):
+        with self._cond:
+            while self.running:
+                now = time.time()
+                if self._batch_ready(now):
+                    break
+                if self._pending:
+                    oldest = min(submitted_at for submitted_at, _, _ in self._pending.values())
+                    self._cond.wait(max(oldest + self.max_wait - now, 0))
+                else:
+                    self._cond.wait()
+            if not self.running:
+                return []
+            queued = sorted(self._pending.items(), key=lambda item: item[1][0])
+            batch = queued[:self.max_batch_size]
+            for source, _ in batch:
+                del self._pending[source]
+        return [(frame, future) for _, (_, frame, future) in batch
+                if future.set_running_or_notify_cancel()]
+
+    def run(self):
+        while self.running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                detections = self.model.predict([frame for frame, _ in batch])
+            except Exception as e:
+                logger.error(f"Batched inference failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), frame_detections in zip(batch, detections):
+                future.set_result(frame_detections)
+            self._record(len(batch))
+        self.model.release()
+        logger.info("Inference scheduler stopped")
+
+    def _record(self, batch_size):
+        self._frames += batch_size
+        self._batches += 1
+        elapsed = time.time() - self._stats_start
+        if elapsed >= self.stats_interval:
+            logger.info(f"Inference scheduler: {self._frames / elapsed:.1f} frames/s, "
+                        f"mean batch {self._frames / self._batches:.1f}, feeds {len(self._feeds)}")
+            self._frames = 0
+            self._batches = 0
+            self._stats_start = time.time()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Started inference scheduler (max batch {self.max_batch_size}, "
+                    f"max wait {self.max_wait * 1000:.0f} ms)")
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._cond.notify_all()
+        for _, _, future in pending:
+            future.cancel()
@@ -0,0 +1,336 @@
+# ingest.py
+import logging
+import threading
+import time
+
+import numpy as np
+
+from capture import open_capture
+from config import Config
+from detectors import Detections
+from frame_ring import DetectionBoard, RingReader, board_name, ring_name
+from model_registry import registry
+from postprocess import draw_detections, filter_detections
+from tracker import Tracker
+
+logger = logging.getLogger(__name__)
+
+class IngestFrame:
+    """
+    One published frame, shared between subscribers and never modified. The
+    overlay is drawn on first use, so streams without overlays (clients that
+    draw from the metadata channel) never pay for it.
+    """
+    __slots__ = ('seq', 'timestamp', 'frame', 'detections', '_annotated', '_lock')
+
+    def __init__(self, seq, timestamp, frame, detections):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.frame = frame
+        self.detections = detections
+        self._annotated = None
+        self._lock = threading.Lock()
+
+    @property
+    def annotated(self):
+        with self._lock:
+            if self._annotated is None:
+                if self.detections is None:
+                    self._annotated = self.frame
+                else:
+                    # Only fire and person boxes are overlaid on the stream
+                    shown = filter_detections(self.detections, ("fire", "person"), 0.6)
+                    self._annotated = draw_detections(self.frame.copy(), shown)
+            return self._annotated
+
+
+class Subscription:
+    """
+    A subscriber's cursor into an ingest; get() skips to the newest frame.
+    If the ingest gives up (e.g. its model failed to load), the subscription
+    moves to a fresh ingest of the same camera after a pause.
+    """
+    def __init__(self, hub, ingest):
+        self.hub = hub
+        self.ingest = ingest
+        self.last_seq = 0
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+
+    def get(self, timeout=5.0):
+        """Newest frame not yet returned to this subscriber, or None on timeout."""
+        item = self.ingest.wait(self.last_seq, timeout)
+        if item is None:
+            if not self.ingest.running and not self.closed:
+                time.sleep(1)
+                self.hub._resubscribe(self)
+            return None
+        if self.last_seq:
+            self.dropped += item.seq - self.last_seq - 1
+        self.last_seq = item.seq
+        self.received += 1
+        return item
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.hub._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Ingest:
+    """
+    One camera opened, decoded and run through the combined model once, with
+    each result published to every subscriber.
+
+    With SHARED_FRAMES the detection service publishes its results for the
+    feed's detection stream, and while it does the ingest draws those
+    (scaled to the viewing stream) instead of running a model of its own.
+    Frames also come from the service's shared-memory ring when the feed is
+    viewed and detected on the same stream; a separate detection substream
+    is too small to view, so the main stream is then decoded here.
+
+    With inference_fps set, frames are still published at the camera's rate
+    but the model only runs that often; frames in between are drawn with the
+    latest detections, moved along their tracks when a tracker is used.
+    """
+    def __init__(self, url, detection_url=None, first_seq=0):
+        self.url = url
+        self.detection_url = detection_url or url
+        self.subscribers = 0
+        self.idle_since = None
+        self.frames = 0
+        # Frame numbers continue from the camera's previous ingest, so consumers' cursors survive a restart
+        self.seq = first_seq
+        self.inferences = 0
+        # Frames drawn with the detection service's results
+        self.shared_detections = 0
+        self._model = None
+        self._detections = None
+        self._last_inference = 0.0
+        self._board = None
+        self._board_retry = 0.0
+        self._board_result = None
+        self.inference_interval = 1.0 / Config.DISPLAY_INFERENCE_FPS if Config.DISPLAY_INFERENCE_FPS > 0 else 0.0
+        self.tracker = None
+        if Config.TRACKING and self.inference_interval:
+            self.tracker = Tracker(labels=("fire", "smoke", "person"), max_coast=Config.TRACK_MAX_COAST)
+        self._condition = threading.Condition()
+        self._latest = None
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"ingest-{url}", daemon=True)
+        self.thread.start()
+
+    def _open(self):
+        if Config.SHARED_FRAMES and self.detection_url == self.url:
+            reader = RingReader(ring_name(self.url))
+            if reader.isOpened():
+                return reader, True
+            reader.release()
+        return open_capture(self.url, Config.CAPTURE_BACKEND), False
+
+    def _published_detections(self, shape):
+        """The detection service's latest result in this frame's pixels, or None while it isn't publishing."""
+        if not Config.SHARED_FRAMES:
+            return None
+        if self._board is None or self._board.closed:
+            now = time.monotonic()
+            if now < self._board_retry:
+                return None
+            # The service (re)creates the board when its detector starts
+            self._board_retry = now + 1.0
+            if self._board:
+                self._board.close()
+                self._board = None
+            try:
+                self._board = DetectionBoard.attach(board_name(self.detection_url))
+            except (FileNotFoundError, ValueError):
+                return None
+        if not self._board.live():
+            return None
+        record = self._board.read()
+        if record is None or (self._board_result and self._board_result[0] == (record[0], shape)):
+            # Being rewritten, unchanged since the last frame, or nothing inferred yet
+            return self._board_result[1] if self._board_result else Detections.empty(self._board.names)
+        seq, _, (height, width), boxes = record
+        scale = np.array([shape[1] / width, shape[0] / height] * 2, np.float32)
+        detections = Detections(boxes[:, :4] * scale, boxes[:, 4].copy(), boxes[:, 5].astype(np.int32),
+                                self._board.names)
+        self._board_result = ((seq, shape), detections)
+        return detections
+
+    def _infer(self, frame, timestamp):
+        if self._detections is None or timestamp - self._last_inference >= self.inference_interval:
+            self._detections = self._model(frame)
+            self._last_inference = timestamp
+            self.inferences += 1
+            if self.tracker:
+                self.tracker.update(self._detections, timestamp)
+        elif self.tracker:
+            # Cached boxes follow their tracks' motion until the next inference
+            self.tracker.coast(timestamp)
+            self._detections = self.tracker.detections(self._detections.names)
+        return self._detections
+
+    def _run(self):
+        cap, shared = self._open()
+        logger.info(f"Ingest started for {self.url} ({'shared ring' if shared else 'own decoder'})")
+        try:
+            while self.running:
+                ok, frame = cap.read()
+                if not ok:
+                    continue
+                if shared:
+                    # Subscribers keep frames longer than the ring guarantees them
+                    frame = frame.copy()
+                timestamp = cap.timestamp
+                detections = self._published_detections(frame.shape)
+                if detections is not None:
+                    self.shared_detections += 1
+                    # Own inference restarts from scratch if the service goes away
+                    self._detections = None
+                else:
+                    if self._model is None:
+                        # Loaded only once the detection service's results are not available
+                        try:
+                            self._model = registry.acquire(Config.COMBINED_MODEL_PATH)
+                        except Exception as e:
+                            logger.error(f"Ingest for {self.url} could not load its model: {e}")
+                            break
+                    try:
+                        detections = self._infer(frame, timestamp)
+                    except Exception as e:
+                        logger.error(f"Detection failed: {e}")
+                        detections = self._detections = None
+                self._publish(frame, timestamp, detections)
+        finally:
+            self.stop()
+            cap.release()
+            if self._model:
+                self._model.release()
+            if self._board:
+                self._board.close()
+            logger.info(f"Ingest stopped for {self.url}")
+
+    def _publish(self, frame, timestamp, detections):
+        with self._condition:
+            if not self.running:
+                # The hub may already have handed seq on to a successor
+                return
+            self.frames += 1
+            self.seq += 1
+            self._latest = IngestFrame(self.seq, timestamp, frame, detections)
+            self._condition.notify_all()
+
+    def wait(self, after_seq, timeout):
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self.running or (self._latest is not None and self._latest.seq > after_seq), timeout)
+            if self._latest is None or self._latest.seq <= after_seq:
+                return None
+            return self._latest
+
+    def stop(self):
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()
+
+
+class IngestHub:
+    """
+    Process-wide map of camera URL to its Ingest. Viewers subscribe instead of
+    opening the camera, so a camera that refuses extra RTSP sessions is only
+    opened once; an ingest without subscribers is torn down after idle_timeout.
+    """
+    def __init__(self, idle_timeout=30.0, stats_interval=60.0):
+        self.idle_timeout = idle_timeout
+        self.stats_interval = stats_interval
+        self._lock = threading.Lock()
+        self._ingests = {}
+        # Last frame number of each camera's stopped ingests
+        self._last_seqs = {}
+        self._reaper = None
+
+    def subscribe(self, url, detection_url=None):
+        """Subscription to the camera at url; detection_url is the feed's detection stream when it has its own."""
+        with self._lock:
+            return Subscription(self, self._join(url, detection_url))
+
+    def _join(self, url, detection_url):
+        # Caller holds the lock
+        ingest = self._ingests.get(url)
+        if ingest is None or not ingest.running:
+            if ingest is not None:
+                self._retire(ingest)
+            ingest = self._ingests[url] = Ingest(url, detection_url, self._last_seqs.get(url, 0))
+        ingest.subscribers += 1
+        ingest.idle_since = None
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap, name="ingest-reaper", daemon=True)
+            self._reaper.start()
+        logger.info(f"Subscribed to {url} ({ingest.subscribers} subscribers)")
+        return ingest
+
+    def _retire(self, ingest):
+        # Caller holds the lock; a stopped ingest publishes nothing more, so its seq is final
+        ingest.stop()
+        self._last_seqs[ingest.url] = max(self._last_seqs.get(ingest.url, 0), ingest.seq)
+
+    def _leave(self, ingest):
+        # Caller holds the lock
+        ingest.subscribers -= 1
+        if ingest.subscribers == 0:
+            ingest.idle_since = time.monotonic()
+
+    def _unsubscribe(self, subscription):
+        ingest = subscription.ingest
+        with self._lock:
+            self._leave(ingest)
+            logger.info(f"Unsubscribed from {ingest.url} ({ingest.subscribers} subscribers, "
+                        f"{subscription.dropped} of its frames dropped)")
+
+    def _resubscribe(self, subscription):
+        old = subscription.ingest
+        with self._lock:
+            if subscription.closed:
+                return
+            self._leave(old)
+            # The new ingest numbers its frames on from the old one, so last_seq stays valid
+            subscription.ingest = self._join(old.url, old.detection_url)
+        logger.info(f"Ingest for {old.url} stopped, moved a subscriber to a new one")
+
+    def _reap(self):
+        last_stats = time.monotonic()
+        while True:
+            time.sleep(1)
+            now = time.monotonic()
+            with self._lock:
+                for url, ingest in list(self._ingests.items()):
+                    if ingest.subscribers == 0 and now - ingest.idle_since >= self.idle_timeout:
+                        del self._ingests[url]
+                        self._retire(ingest)
+            if now - last_stats >= self.stats_interval:
+                last_stats = now
+                self.log_stats()
+
+    def stats(self):
+        with self._lock:
+            return [{'url': ingest.url, 'subscribers': ingest.subscribers, 'frames': ingest.frames,
+                     'inferences': ingest.inferences, 'sharedDetections': ingest.shared_detections}
+                    for ingest in self._ingests.values()]
+
+    def log_stats(self):
+        for stat in self.stats():
+            logger.info(f"Ingest {stat['url']}: {stat['subscribers']} subscribers, {stat['frames']} frames, "
+                        f"{stat['inferences']} inferences, {stat['sharedDetections']} frames with the "
+                        f"detection service's results")
+
+
+# Process-wide hub shared by MJPEG viewers and WebRTC tracks
+hub = IngestHub(idle_timeout=Config.INGEST_IDLE_TIMEOUT)
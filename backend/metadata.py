@@ -0,0 +1,29 @@
+# metadata.py
+import json
+
+from postprocess import filter_detections
+
+
+def frame_metadata(item, min_conf=0.0):
+    """
+    Compact detection record of one ingest frame. seq and timestamp match the
+    X-Frame-Seq / X-Frame-Timestamp headers of the MJPEG part carrying the
+    same frame, and boxes are in that frame's pixels, so clients can draw the
+    overlay themselves.
+    """
+    height, width = item.frame.shape[:2]
+    record = {'seq': item.seq, 'timestamp': round(item.timestamp, 3), 'width': width, 'height': height,
+              'detections': []}
+    if item.detections is not None:
+        shown = filter_detections(item.detections, None, min_conf)
+        record['detections'] = [
+            {'label': shown.names[cls], 'score': round(score, 3), 'box': [round(v, 1) for v in box]}
+            for box, score, cls in zip(shown.xyxy.tolist(), shown.conf.tolist(), shown.cls.tolist())
+        ]
+    return record
+
+
+def sse_event(record):
+    """Server-sent event carrying one frame's record; the event id is the frame's seq."""
+    data = json.dumps(record, separators=(',', ':'))
+    return f"id: {record['seq']}\nevent: detections\ndata: {data}\n\n".encode()
@@ -0,0 +1,168 @@
+# mjpeg.py
+import itertools
+import logging
+import math
+import threading
+import time
+
+import cv2
+
+from ingest import hub
+
+logger = logging.getLogger(__name__)
+
+
+def part(data, seq, timestamp):
+    """One multipart/x-mixed-replace part; the headers line frames up with the detection metadata."""
+    return (b'--frame\r\nContent-Type: image/jpeg\r\n'
+            b'X-Frame-Seq: %d\r\nX-Frame-Timestamp: %.3f\r\n\r\n' % (seq, timestamp)) + data + b'\r\n'
+
+
+def slow_drops(seq, timestamp, last_seq, last_timestamp, interval):
+    """
+    Frames skipped between two sent frames beyond the ones the viewer's fps
+    cap skips anyway, i.e. the frames lost to a slow client.
+    """
+    skipped = seq - last_seq - 1
+    if skipped <= 0:
+        return 0
+    period = (timestamp - last_timestamp) / (seq - last_seq)
+    if period <= 0:
+        return 0
+    # Tolerance for timestamp jitter on an exact multiple of the camera's frame period
+    allowed = math.ceil(interval / period - 0.01) - 1
+    return max(0, skipped - allowed)
+
+
+class Viewer:
+    def __init__(self, viewer_id, quality, max_fps, overlay=True):
+        self.id = viewer_id
+        self.quality = quality
+        self.max_fps = max_fps
+        # Without the overlay the client draws boxes from /detections itself
+        self.overlay = overlay
+        self.sent = 0
+        # Frames lost to a slow client; skips required by max_fps are not counted
+        self.dropped = 0
+        self.subscription = None
+
+
+class MjpegBroadcaster:
+    """
+    MJPEG for all viewers of one feed. Each frame is JPEG-encoded at most
+    once per quality level and overlay choice, by whichever viewer needs it
+    first, and the bytes are shared. Viewers are paced to their own
+    frame-rate cap and always skip to the newest frame, so a slow client
+    drops frames instead of falling behind or holding up the others.
+    """
+    def __init__(self, feed_id, url, detection_url=None):
+        self.feed_id = feed_id
+        self.url = url
+        self.detection_url = detection_url
+        self.encodes = 0
+        self.viewers = {}
+        self._lock = threading.Lock()
+        self._encode_locks = {}
+        # (quality, overlay) -> (seq, jpeg bytes) of the last frame encoded that way
+        self._encoded = {}
+
+    def jpeg(self, item, quality, overlay=True):
+        key = (quality, overlay)
+        with self._lock:
+            encode_lock = self._encode_locks.setdefault(key, threading.Lock())
+        with encode_lock:
+            cached = self._encoded.get(key)
+            if cached and cached[0] == item.seq:
+                return cached[1]
+            image = item.annotated if overlay else item.frame
+            ok, jpeg = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+            if not ok:
+                return None
+            data = jpeg.tobytes()
+            self._encoded[key] = (item.seq, data)
+            self.encodes += 1
+            return data
+
+    def stream(self, viewer):
+        """Multipart body for one registered viewer; unregisters it when the client disconnects."""
+        interval = 1.0 / viewer.max_fps
+        next_frame = 0.0
+        last = None
+        try:
+            viewer.subscription = hub.subscribe(self.url, self.detection_url)
+            while True:
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                item = viewer.subscription.get()
+                if item is None:
+                    continue
+                next_frame = time.monotonic() + interval
+                data = self.jpeg(item, viewer.quality, viewer.overlay)
+                if data is None:
+                    continue
+                if last:
+                    viewer.dropped += slow_drops(item.seq, item.timestamp, *last, interval)
+                last = (item.seq, item.timestamp)
+                yield part(data, item.seq, item.timestamp)
+                viewer.sent += 1
+        finally:
+            if viewer.subscription:
+                viewer.subscription.close()
+            _remove_viewer(self, viewer)
+
+    def stats(self):
+        with self._lock:
+            viewers = list(self.viewers.values())
+        return {
+            'feedId': self.feed_id,
+            'encodes': self.encodes,
+            'viewers': [{'id': viewer.id, 'quality': viewer.quality, 'maxFps': viewer.max_fps,
+                         'overlay': viewer.overlay, 'sent': viewer.sent, 'dropped': viewer.dropped}
+                        for viewer in viewers],
+        }
+
+
+_lock = threading.Lock()
+_broadcasters = {}
+_viewer_ids = itertools.count(1)
+
+
+def stream(feed_id, url, quality, max_fps, overlay=True, detection_url=None):
+    """
+    Multipart body for a new MJPEG client of a feed. The viewer is registered
+    when the body is first iterated, so a response that is never sent (HEAD,
+    client gone before the first frame) leaves nothing behind.
+    """
+    broadcaster, viewer = _add_viewer(feed_id, url, quality, max_fps, overlay, detection_url)
+    yield from broadcaster.stream(viewer)
+
+
+def _add_viewer(feed_id, url, quality, max_fps, overlay, detection_url):
+    with _lock:
+        broadcaster = _broadcasters.get(feed_id)
+        if broadcaster is None or broadcaster.url != url:
+            broadcaster = _broadcasters[feed_id] = MjpegBroadcaster(feed_id, url, detection_url)
+        viewer = Viewer(next(_viewer_ids), quality, max_fps, overlay)
+        with broadcaster._lock:
+            broadcaster.viewers[viewer.id] = viewer
+    logger.info(f"MJPEG viewer {viewer.id} joined feed {feed_id} ({len(broadcaster.viewers)} viewers)")
+    return broadcaster, viewer
+
+
+def _remove_viewer(broadcaster, viewer):
+    with _lock:
+        with broadcaster._lock:
+            broadcaster.viewers.pop(viewer.id, None)
+            empty = not broadcaster.viewers
+        if empty and _broadcasters.get(broadcaster.feed_id) is broadcaster:
+            del _broadcasters[broadcaster.feed_id]
+    logger.info(f"MJPEG viewer {viewer.id} left feed {broadcaster.feed_id} "
+                f"(sent {viewer.sent} frames, dropped {viewer.dropped}; feed encoded {broadcaster.encodes})")
+
+
+def stats(feed_ids=None):
+    with _lock:
+        broadcasters = list(_broadcasters.values())
+    return [broadcaster.stats() for broadcaster in broadcasters
+            if feed_ids is None or broadcaster.feed_id in feed_ids]
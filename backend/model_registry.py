@@ -0,0 +1,158 @@
+# model_registry.py
+import gc
+import logging
+import threading
+
+import psutil
+
+from config import Config
+from detectors import create_detector
+
+logger = logging.getLogger(__name__)
+
+
+def _rss():
+    return psutil.Process().memory_info().rss
+
+
+class _ModelEntry:
+    def __init__(self, key, model, rss_bytes):
+        self.key = key
+        self.path = model.path
+        self.backend = model.backend
+        self.device = model.device
+        self.model = model
+        self.rss_bytes = rss_bytes
+        self.param_bytes = model.weight_bytes()
+        self.refcount = 0
+        # ultralytics predictors keep per-call state, so those run one call at a time
+        self.lock = None if model.thread_safe else threading.Lock()
+
+
+class ModelHandle:
+    """
+    Thread-safe inference handle onto a detector shared through the registry.
+    Call it like the Detector; release() it when the owner is done.
+    """
+    def __init__(self, registry, entry):
+        self._registry = registry
+        self._entry = entry
+        self.released = False
+
+    @property
+    def path(self):
+        return self._entry.path
+
+    @property
+    def device(self):
+        return self._entry.device
+
+    @property
+    def backend(self):
+        return self._entry.backend
+
+    @property
+    def names(self):
+        return self._entry.model.names
+
+    @property
+    def imgsz(self):
+        return self._entry.model.imgsz
+
+    @property
+    def dynamic_size(self):
+        # False for exported graphs with a fixed input size
+        return self._entry.model.dynamic_size
+
+    def _run(self, fn, *args, **kwargs):
+        if self.released:
+            raise RuntimeError(f"Model handle for {self.path} used after release")
+        if self._entry.lock is None:
+            return fn(*args, **kwargs)
+        with self._entry.lock:
+            return fn(*args, **kwargs)
+
+    def predict(self, frames, imgsz=None, conf=None):
+        return self._run(self._entry.model.predict, frames, imgsz, conf)
+
+    def __call__(self, frame, imgsz=None, conf=None):
+        return self._run(self._entry.model, frame, imgsz, conf)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._registry._release(self._entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ModelRegistry:
+    """
+    Loads each weight file once per process and reference-counts its users.
+    A model is dropped from memory when its last handle is released.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def acquire(self, path, backend=None, device=None, precision=None):
+        backend = backend or Config.DETECTOR_BACKEND
+        device = device or Config.DETECTOR_DEVICE
+        precision = precision or Config.DETECTOR_PRECISION
+        key = (path, backend, device, precision)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+                self._entries[key] = entry
+            entry.refcount += 1
+            logger.info(f"Acquired model {entry.path} on {entry.device} (refcount: {entry.refcount})")
+            return ModelHandle(self, entry)
+
+    def _load(self, key):
+        path, backend, device, precision = key
+        rss_before = _rss()
+        model = create_detector(path, backend, device, precision, threads=Config.DETECTOR_THREADS)
+        entry = _ModelEntry(key, model, max(_rss() - rss_before, 0))
+        logger.info(f"Loaded {backend} {precision} model {entry.path} on {entry.device} "
+                    f"(rss: {entry.rss_bytes / 2**20:.1f} MiB, weights: {entry.param_bytes / 2**20:.1f} MiB)")
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.refcount -= 1
+            logger.info(f"Released model {entry.path} on {entry.device} (refcount: {entry.refcount})")
+            if entry.refcount > 0:
+                return
+            self._entries.pop(entry.key, None)
+            entry.model = None
+        gc.collect()
+        if entry.backend == 'torch' and entry.device.startswith('cuda'):
+            import torch
+            torch.cuda.empty_cache()
+        logger.info(f"Unloaded model {entry.path} from {entry.device}")
+
+    def stats(self):
+        with self._lock:
+            return [{
+                'path': entry.path,
+                'backend': entry.backend,
+                'device': entry.device,
+                'refcount': entry.refcount,
+                'rss_bytes': entry.rss_bytes,
+                'param_bytes': entry.param_bytes,
+            } for entry in self._entries.values()]
+
+    def log_stats(self):
+        for stat in self.stats():
+            logger.info(f"Model {stat['path']} on {stat['device']}: {stat['refcount']} users, "
+                        f"rss {stat['rss_bytes'] / 2**20:.1f} MiB, "
+                        f"weights {stat['param_bytes'] / 2**20:.1f} MiB")
+
+
+# Process-wide registry shared by detectors and stream cameras
+registry = ModelRegistry()
@@ -15,9 +15,22 @@ class Feed(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False)
     location = db.Column(db.String(120), nullable=True)
+    # Full-resolution stream for viewing (MJPEG / WebRTC)
     rtsp_url = db.Column(db.String(300), nullable=True)
+    # Low-resolution substream the detector decodes; None falls back to rtsp_url
+    detection_url = db.Column(db.String(300), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
     fire_detected = db.Column(db.Boolean, default=False)
     last_fire_detected_time = db.Column(db.DateTime, nullable=True)
-    status = db.Column(db.String(50), default='offline') 
\ No newline at end of file
+    status = db.Column(db.String(50), default='offline')
+
+    # Fraction of the downsampled frame that must change before inference runs;
+    # None uses Config.MOTION_THRESHOLD
+    motion_threshold = db.Column(db.Float, nullable=True)
+    # JSON list of polygons of normalised [x, y] points to monitor; None monitors the whole frame
+    roi = db.Column(db.Text, nullable=True)
+
+    @property
+    def detection_stream(self):
+        return self.detection_url or self.rtsp_url
@@ -0,0 +1,98 @@
+# motion.py
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap change detector run ahead of YOLO. Frames are downsampled to
+    grayscale and compared against a background model (or the previous frame);
+    inference runs only when the changed fraction of the image exceeds the
+    threshold, or when max_idle seconds have passed since the last inference.
+    """
+    def __init__(self, threshold=0.002, max_idle=5.0, width=160, pixel_threshold=25,
+                 use_background=True, crop=False, min_crop=0.25, crop_margin=0.1):
+        self.threshold = threshold
+        self.max_idle = max_idle
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.crop = crop
+        self.min_crop = min_crop
+        self.crop_margin = crop_margin
+
+        self.subtractor = None
+        if use_background:
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=False)
+        self.previous = None
+        self.kernel = np.ones((3, 3), np.uint8)
+        self.last_run_time = None
+
+        self.frames = 0
+        self.skipped = 0
+        self.last_change = 0.0
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def _change_mask(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(int(h * self.width / w), 1)), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        if self.subtractor is not None:
+            mask = self.subtractor.apply(gray)
+        else:
+            if self.previous is None:
+                self.previous = gray
+            mask = cv2.threshold(cv2.absdiff(gray, self.previous), self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]
+            self.previous = gray
+        # Drop single-pixel sensor noise before measuring
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+
+    def _changed_region(self, mask, shape):
+        """Bounding box of the changed pixels in full-frame coordinates, or None for the whole frame."""
+        points = cv2.findNonZero(mask)
+        if points is None:
+            return None
+        x, y, w, h = cv2.boundingRect(points)
+        frame_h, frame_w = shape[:2]
+        scale_x, scale_y = frame_w / mask.shape[1], frame_h / mask.shape[0]
+        margin_x, margin_y = self.crop_margin * frame_w, self.crop_margin * frame_h
+        x1, y1 = x * scale_x - margin_x, y * scale_y - margin_y
+        x2, y2 = (x + w) * scale_x + margin_x, (y + h) * scale_y + margin_y
+
+        # Keep enough context around small changes for the detector
+        min_w, min_h = self.min_crop * frame_w, self.min_crop * frame_h
+        if x2 - x1 < min_w:
+            cx = (x1 + x2) / 2
+            x1, x2 = cx - min_w / 2, cx + min_w / 2
+        if y2 - y1 < min_h:
+            cy = (y1 + y2) / 2
+            y1, y2 = cy - min_h / 2, cy + min_h / 2
+        x1, y1 = int(max(x1, 0)), int(max(y1, 0))
+        x2, y2 = int(min(x2, frame_w)), int(min(y2, frame_h))
+        if (x2 - x1) * (y2 - y1) > 0.5 * frame_w * frame_h:
+            return None
+        return x1, y1, x2, y2
+
+    def check(self, frame, timestamp, force=False):
+        """
+        Returns (run, region). run says whether inference is due for this frame;
+        region is an (x1, y1, x2, y2) crop of the changed area when cropping is
+        enabled and the change is small enough to be worth it, otherwise None.
+        force keeps the background model updated but always runs on the full
+        frame, for use while an incident is in progress.
+        """
+        mask = self._change_mask(frame)
+        self.last_change = cv2.countNonZero(mask) / mask.size
+        self.frames += 1
+
+        idle_expired = self.last_run_time is None or timestamp - self.last_run_time >= self.max_idle
+        if self.last_change < self.threshold and not idle_expired and not force:
+            self.skipped += 1
+            return False, None
+
+        self.last_run_time = timestamp
+        if force or not self.crop or self.last_change < self.threshold:
+            return True, None
+        return True, self._changed_region(mask, frame.shape)
@@ -0,0 +1,39 @@
+# postprocess.py
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+
+@lru_cache(maxsize=64)
+def _class_ids(names, labels):
+    return np.array([cls for cls, name in names if name.lower() in labels], np.int32)
+
+
+def class_ids(names, labels):
+    """Class ids whose (case-insensitive) name is in labels."""
+    return _class_ids(tuple(names.items()), frozenset(label.lower() for label in labels))
+
+
+def filter_detections(detections, labels=None, min_conf=0.0):
+    """Boxes of the given labels with confidence above min_conf, as one vectorised mask."""
+    keep = detections.conf > min_conf
+    if labels is not None:
+        keep &= np.isin(detections.cls, class_ids(detections.names, labels))
+    return detections.select(keep)
+
+
+def best_confidence(detections, labels, min_conf=0.0):
+    """Highest confidence among boxes of the given labels above min_conf, or 0.0."""
+    matches = filter_detections(detections, labels, min_conf)
+    return float(matches.conf.max()) if len(matches) else 0.0
+
+
+def draw_detections(frame, detections, color=(0, 255, 0)):
+    """Draw already-filtered boxes with 'label conf' captions onto frame in place."""
+    boxes = detections.xyxy.astype(np.int32)
+    for (x1, y1, x2, y2), conf, cls in zip(boxes.tolist(), detections.conf.tolist(), detections.cls.tolist()):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{detections.names[cls]} {conf:.2f}", (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return frame
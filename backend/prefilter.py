@@ -0,0 +1,68 @@
+# prefilter.py
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class FlamePrefilter:
+    """
+    Cheap cascade stage ahead of the fire model. Each frame is downsampled
+    and scored for flame-coloured pixels (YCbCr rules of Celik & Demirel)
+    and for temporal flicker of those pixels over the last few frames.
+    Frames without enough flame-like pixels, or whose flame-like pixels are
+    perfectly steady (a red sign, a lamp), are rejected.
+    """
+    def __init__(self, width=160, min_flame=0.0005, min_flicker=0.02, history=6, chroma_gap=40):
+        self.width = width
+        self.min_flame = min_flame
+        self.min_flicker = min_flicker
+        self.chroma_gap = chroma_gap
+        self.masks = deque(maxlen=history)
+
+        self.frames = 0
+        self.passed = 0
+        self.last_flame = 0.0
+        self.last_flicker = 0.0
+
+    @property
+    def pass_rate(self):
+        return self.passed / self.frames if self.frames else 1.0
+
+    def flame_mask(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(int(h * self.width / w), 1)), interpolation=cv2.INTER_AREA)
+        ycrcb = cv2.cvtColor(small, cv2.COLOR_BGR2YCrCb).astype(np.int16)
+        y, cr, cb = ycrcb[:, :, 0], ycrcb[:, :, 1], ycrcb[:, :, 2]
+        return ((y > y.mean()) & (cb < cb.mean()) & (cr > cr.mean())
+                & (y > cb) & (cr > cb) & (np.abs(cb - cr) >= self.chroma_gap))
+
+    def flame_ratio(self, frame):
+        """Fraction of flame-coloured pixels in a single frame."""
+        return float(self.flame_mask(frame).mean())
+
+    def _flicker(self):
+        if len(self.masks) < 2:
+            return None
+        stack = np.stack(self.masks)
+        candidates = stack.any(axis=0)
+        if not candidates.any():
+            return 0.0
+        transitions = (stack[1:] != stack[:-1]).sum(axis=0)
+        return float(transitions[candidates].mean() / (len(self.masks) - 1))
+
+    def check(self, frame):
+        """True when the frame should go on to the fire model."""
+        mask = self.flame_mask(frame)
+        self.masks.append(mask)
+        self.last_flame = float(mask.mean())
+        flicker = self._flicker()
+        self.last_flicker = flicker or 0.0
+        self.frames += 1
+
+        # Until the history fills, colour alone decides
+        passed = self.last_flame >= self.min_flame and (flicker is None or len(self.masks) < self.masks.maxlen
+                                                         or flicker >= self.min_flicker)
+        if passed:
+            self.passed += 1
+        return passed
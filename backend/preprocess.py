@@ -0,0 +1,102 @@
+# preprocess.py
+import math
+import threading
+
+import cv2
+import numpy as np
+
+PAD_VALUE = 114
+
+
+class LetterboxTransform:
+    """Maps boxes from model input coordinates back to the original frame."""
+    __slots__ = ('ratio', 'pad_x', 'pad_y', 'height', 'width')
+
+    def __init__(self, ratio, pad_x, pad_y, height, width):
+        self.ratio = ratio
+        self.pad_x = pad_x
+        self.pad_y = pad_y
+        self.height = height
+        self.width = width
+
+    def to_frame(self, xyxy):
+        """Rescale (N, 4) xyxy boxes in place and clip them to the frame."""
+        xyxy -= np.array([self.pad_x, self.pad_y, self.pad_x, self.pad_y], xyxy.dtype)
+        xyxy /= self.ratio
+        np.clip(xyxy[:, 0::2], 0, self.width, out=xyxy[:, 0::2])
+        np.clip(xyxy[:, 1::2], 0, self.height, out=xyxy[:, 1::2])
+        return xyxy
+
+
+class Preprocessor:
+    """
+    Turns decoded BGR frames into the model's NCHW float32 RGB input with a
+    single resize + letterbox, writing into per-thread buffers that are reused
+    across calls. The returned tensor is a view into those buffers and stays
+    valid until the same thread calls again.
+
+    With rect=True the padding only goes up to a stride multiple (ultralytics'
+    'auto' letterbox) when every frame in the batch has the same shape;
+    otherwise frames are padded to size x size.
+    """
+    def __init__(self, size=640, stride=32, rect=False):
+        self.size = size
+        self.stride = stride
+        self.rect = rect
+        self._local = threading.local()
+
+    def input_shape(self, frames):
+        if self.rect and len({frame.shape[:2] for frame in frames}) == 1:
+            h, w = frames[0].shape[:2]
+            ratio = min(self.size / h, self.size / w)
+            out_h = math.ceil(round(h * ratio) / self.stride) * self.stride
+            out_w = math.ceil(round(w * ratio) / self.stride) * self.stride
+            return out_h, out_w
+        return self.size, self.size
+
+    def _buffers(self, batch, out_h, out_w):
+        local = self._local
+        tensor = getattr(local, 'tensor', None)
+        if tensor is None or tensor.shape[0] < batch or tensor.shape[2:] != (out_h, out_w):
+            local.tensor = np.empty((batch, 3, out_h, out_w), np.float32)
+            local.canvas = np.full((out_h, out_w, 3), PAD_VALUE, np.uint8)
+            local.scratch = {}
+        return local.tensor, local.canvas, local.scratch
+
+    def __call__(self, frames, batch=None):
+        """
+        Returns (tensor, transforms). batch reserves extra rows for graphs
+        with a fixed batch size; rows past len(frames) hold stale data.
+        """
+        out_h, out_w = self.input_shape(frames)
+        tensor, canvas, scratch = self._buffers(max(batch or 0, len(frames)), out_h, out_w)
+
+        transforms = []
+        for i, frame in enumerate(frames):
+            h, w = frame.shape[:2]
+            ratio = min(out_h / h, out_w / w)
+            new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+            pad_x, pad_y = (out_w - new_w) / 2, (out_h - new_h) / 2
+            top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+
+            # Refresh the border; the image area is fully overwritten below
+            canvas[:top] = PAD_VALUE
+            canvas[top + new_h:] = PAD_VALUE
+            canvas[:, :left] = PAD_VALUE
+            canvas[:, left + new_w:] = PAD_VALUE
+
+            if left == 0 and new_w == out_w:
+                # Full-width rows are contiguous, so resize straight into the canvas
+                cv2.resize(frame, (new_w, new_h), dst=canvas[top:top + new_h], interpolation=cv2.INTER_LINEAR)
+            else:
+                resized = scratch.get((new_h, new_w))
+                if resized is None:
+                    resized = scratch[(new_h, new_w)] = np.empty((new_h, new_w, 3), np.uint8)
+                cv2.resize(frame, (new_w, new_h), dst=resized, interpolation=cv2.INTER_LINEAR)
+                canvas[top:top + new_h, left:left + new_w] = resized
+
+            # BGR HWC uint8 -> RGB CHW float32 in [0, 1], in one pass
+            np.multiply(canvas[:, :, ::-1].transpose(2, 0, 1), np.float32(1 / 255), out=tensor[i], casting='unsafe')
+            transforms.append(LetterboxTransform(ratio, left, top, h, w))
+
+        return tensor[:max(batch or 0, len(frames))], transforms
@@ -0,0 +1,305 @@
+# quantize_models.py
+# INT8 post-training quantization of the yolo11n weights for CPU inference,
+# calibrated on a fixed random sample of the merged D-Fire/Human dataset
+# built by integrating_models.ipynb, plus an accuracy/speed report.
+#
+# Usage (from backend/):
+#   python quantize_models.py --data ../detection_models/yolo_models/merged_dataset
+#   python quantize_models.py --formats onnx --calib-size 500 --report ../detection_models/yolo_models/quantization_report.md
+#
+# Run the result with DETECTOR_BACKEND=onnx (or openvino) DETECTOR_PRECISION=int8.
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import cv2
+import yaml
+
+from config import Config
+from detectors import create_detector, resolve_weights
+from preprocess import Preprocessor
+from export_models import export
+
+# Class order of dataset2.yaml / the merged dataset
+DATASET_NAMES = ['smoke', 'fire', 'person']
+
+BACKEND_LABELS = {'onnx': 'ONNX', 'openvino': 'OpenVINO'}
+
+
+def sample_images(data_dir, split, count, seed):
+    image_dir = os.path.join(data_dir, 'images', split)
+    names = sorted(n for n in os.listdir(image_dir) if n.lower().endswith(('.jpg', '.jpeg', '.png')))
+    random.Random(seed).shuffle(names)
+    return [os.path.join(image_dir, n) for n in names[:count]]
+
+
+def write_dataset_yaml(data_dir, val='images/val'):
+    """dataset2.yaml points at the original author's machine, so write one for data_dir."""
+    handle = tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False)
+    yaml.safe_dump({
+        'path': os.path.abspath(data_dir),
+        'train': 'images/train',
+        'val': val,
+        'nc': len(DATASET_NAMES),
+        'names': DATASET_NAMES,
+    }, handle)
+    handle.close()
+    return handle.name
+
+
+def write_calibration_yaml(data_dir, images):
+    """
+    Dataset yaml whose val split is the calibration sample, as an image list.
+    ultralytics calibrates OpenVINO INT8 on the val split, which would
+    otherwise be the first images of the split the report measures mAP on.
+    """
+    handle = tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False)
+    handle.write("\n".join(os.path.abspath(p) for p in images) + "\n")
+    handle.close()
+    return write_dataset_yaml(data_dir, val=handle.name)
+
+
+class CalibrationReader:
+    """Feeds letterboxed calibration images to onnxruntime's calibrator."""
+    def __init__(self, images, input_name, imgsz):
+        self.images = iter(images)
+        self.input_name = input_name
+        self.preprocess = Preprocessor(imgsz)
+
+    def get_next(self):
+        for image_path in self.images:
+            frame = cv2.imread(image_path)
+            if frame is None:
+                continue
+            tensor, _ = self.preprocess([frame])
+            return {self.input_name: tensor.copy()}
+        return None
+
+
+def head_nodes(model):
+    """
+    Non-conv nodes of the Detect head (box decoding, DFL, concat of boxes and
+    class scores). Boxes and scores share one output tensor with very different
+    ranges, so they stay in float to keep localisation intact.
+    """
+    layers = [int(m.group(1)) for node in model.graph.node for m in [re.match(r'/model\.(\d+)/', node.name)] if m]
+    if not layers:
+        return []
+    prefix = f"/model.{max(layers)}/"
+    return [node.name for node in model.graph.node if node.name.startswith(prefix) and node.op_type != 'Conv']
+
+
+def quantize_onnx(weights, images, imgsz):
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    fp32_path = resolve_weights(weights, 'onnx')
+    if not os.path.exists(fp32_path):
+        fp32_path = export(weights, 'onnx', imgsz, dynamic=False)
+    int8_path = resolve_weights(weights, 'onnx', 'int8')
+
+    prepared_path = fp32_path.replace('.onnx', '_prep.onnx')
+    quant_pre_process(fp32_path, prepared_path)
+    fp32_model = onnx.load(fp32_path)
+    input_name = ort.InferenceSession(prepared_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    quantize_static(
+        prepared_path,
+        int8_path,
+        CalibrationReader(images, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=head_nodes(fp32_model),
+    )
+    os.remove(prepared_path)
+
+    # Keep the class names and other ultralytics metadata on the quantized graph
+    int8_model = onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+    print(f"Quantized {fp32_path} -> {int8_path}")
+    return int8_path
+
+
+def quantize_openvino(weights, calibration_yaml, imgsz):
+    from ultralytics import YOLO
+
+    # ultralytics runs NNCF post-training quantization on the yaml's val split, here the calibration sample
+    path = YOLO(weights).export(format='openvino', int8=True, data=calibration_yaml, fraction=1.0, imgsz=imgsz)
+    int8_path = resolve_weights(weights, 'openvino', 'int8')
+    if os.path.abspath(path) != os.path.abspath(int8_path):
+        os.replace(path, int8_path)
+    print(f"Quantized {weights} -> {int8_path}")
+    return int8_path
+
+
+def write_eval_yaml(data_dir, names):
+    """
+    Dataset yaml for a model whose classes are a subset of the merged
+    dataset's (the fire-only and person-only weights): the val split with its
+    labels renumbered to the model's class ids and other classes dropped, so
+    their images count as backgrounds. None when no class is shared.
+    """
+    mapping = {DATASET_NAMES.index(name.lower()): cls for cls, name in names.items() if name.lower() in DATASET_NAMES}
+    if not mapping:
+        return None
+    root = tempfile.mkdtemp(prefix='quantize_eval_')
+    os.makedirs(os.path.join(root, 'images'))
+    # ultralytics finds each image's labels by swapping images/ for labels/ in its path
+    os.symlink(os.path.abspath(os.path.join(data_dir, 'images', 'val')), os.path.join(root, 'images', 'val'))
+    source_dir, label_dir = os.path.join(data_dir, 'labels', 'val'), os.path.join(root, 'labels', 'val')
+    os.makedirs(label_dir)
+    for label_file in os.listdir(source_dir):
+        with open(os.path.join(source_dir, label_file)) as f:
+            rows = [line.split() for line in f if line.strip()]
+        with open(os.path.join(label_dir, label_file), 'w') as f:
+            for cls, *box in rows:
+                if int(cls) in mapping:
+                    f.write(" ".join([str(mapping[int(cls)]), *box]) + "\n")
+
+    handle = tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False)
+    yaml.safe_dump({
+        'path': root,
+        'train': 'images/val',
+        'val': 'images/val',
+        'nc': len(names),
+        'names': [names[cls] for cls in sorted(names)],
+    }, handle)
+    handle.close()
+    return handle.name
+
+
+_eval_yamls = {}
+
+
+def eval_yaml(data_dir, dataset_yaml, names):
+    # The combined model matches the merged dataset as is; others get a relabelled copy, built once per class list
+    if [name.lower() for name in names.values()] == DATASET_NAMES:
+        return dataset_yaml
+    key = tuple(sorted(names.items()))
+    if key not in _eval_yamls:
+        _eval_yamls[key] = write_eval_yaml(data_dir, names)
+    return _eval_yamls[key]
+
+
+def evaluate(weights, backend, precision, data_dir, dataset_yaml, images, imgsz):
+    """mAP@0.5, mAP@0.5:0.95 on the val split (for the model's own classes) and mean single-frame CPU latency."""
+    from ultralytics import YOLO
+
+    detector = create_detector(weights, backend, 'cpu', precision, imgsz=imgsz)
+    frames = [f for f in (cv2.imread(p) for p in images) if f is not None]
+    for frame in frames[:5]:
+        detector(frame)
+    start = time.perf_counter()
+    for frame in frames:
+        detector(frame)
+    latency = (time.perf_counter() - start) / max(len(frames), 1) * 1000
+
+    map50 = map50_95 = None
+    data = eval_yaml(data_dir, dataset_yaml, detector.names)
+    if data:
+        metrics = YOLO(resolve_weights(weights, backend, precision), task='detect').val(
+            data=data, imgsz=imgsz, batch=1, device='cpu', plots=False, verbose=False)
+        map50, map50_95 = metrics.box.map50, metrics.box.map
+    return map50, map50_95, latency
+
+
+def format_report(weights, rows):
+    """rows: (label, map50, map50_95, latency); the first row is the FP32 PyTorch baseline."""
+    _, base_map50, _, base_latency = rows[0]
+    lines = [
+        f"### {os.path.basename(weights)}",
+        "",
+        "| Model       | mAP@0.5 | mAP@0.5:0.95 | Latency |",
+        "|-------------|---------|--------------|---------|",
+    ]
+    for label, map50, map50_95, latency in rows:
+        if map50 is None:
+            map50_cell = map50_95_cell = "—"
+        else:
+            map50_cell, map50_95_cell = f"{map50:.3f}", f"{map50_95:.3f}"
+            if label != rows[0][0] and base_map50 is not None:
+                map50_cell += f" ({map50 - base_map50:+.3f})"
+        latency_cell = f"{latency:.0f} ms"
+        if label != rows[0][0]:
+            latency_cell += f" ({base_latency / latency:.1f}x)"
+        lines.append(f"| {label} | {map50_cell} | {map50_95_cell} | {latency_cell} |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='INT8 post-training quantization of the detection weights')
+    # Both DETECTOR_MODEs: separate loads the fire and person weights, unified the combined ones
+    parser.add_argument('--weights', nargs='+',
+                        default=[Config.FIRE_MODEL_PATH, Config.PERSON_MODEL_PATH, Config.COMBINED_MODEL_PATH])
+    parser.add_argument('--data', default='../detection_models/yolo_models/merged_dataset',
+                        help='Merged dataset root from integrating_models.ipynb')
+    parser.add_argument('--formats', nargs='+', choices=('onnx', 'openvino'), default=['onnx', 'openvino'])
+    parser.add_argument('--calib-size', type=int, default=300, help='Calibration images sampled from the train split')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--latency-images', type=int, default=100)
+    parser.add_argument('--report', default='../detection_models/yolo_models/quantization_report.md')
+    parser.add_argument('--skip-report', action='store_true')
+    args = parser.parse_args()
+
+    if not os.path.isdir(os.path.join(args.data, 'images', 'train')):
+        sys.exit(f"No merged dataset at {args.data}; build it with integrating_models.ipynb")
+
+    calibration = sample_images(args.data, 'train', args.calib_size, args.seed)
+    dataset_yaml = write_dataset_yaml(args.data)
+    calibration_yaml = write_calibration_yaml(args.data, calibration)
+
+    for weights in args.weights:
+        if 'onnx' in args.formats:
+            quantize_onnx(weights, calibration, args.imgsz)
+        if 'openvino' in args.formats:
+            if not os.path.exists(resolve_weights(weights, 'openvino')):
+                export(weights, 'openvino', args.imgsz, dynamic=False)
+            quantize_openvino(weights, calibration_yaml, args.imgsz)
+
+    if args.skip_report:
+        return
+
+    latency_images = sample_images(args.data, 'val', args.latency_images, args.seed)
+    sections = [
+        "## INT8 Quantization Report",
+        "",
+        f"Calibration: {len(calibration)} images sampled from the train split of `{args.data}` "
+        f"(seed {args.seed}), the same sample for {' and '.join(BACKEND_LABELS[f] for f in args.formats)}. "
+        "mAP: full val split, disjoint from the calibration sample; the fire and person models are scored "
+        "on their own classes only. "
+        f"Latency: mean over {len(latency_images)} val images, single frame, CPU. "
+        "mAP drop and speedup are relative to the FP32 PyTorch model.",
+        "",
+    ]
+    for weights in args.weights:
+        def run(backend, precision):
+            return evaluate(weights, backend, precision, args.data, dataset_yaml, latency_images, args.imgsz)
+
+        rows = [('YOLOv11n FP32 (PyTorch)', *run('torch', 'fp32'))]
+        for fmt in args.formats:
+            label = BACKEND_LABELS[fmt]
+            rows.append((f'YOLOv11n FP32 ({label})', *run(fmt, 'fp32')))
+            rows.append((f'**YOLOv11n INT8 ({label})**', *run(fmt, 'int8')))
+        sections.append(format_report(weights, rows))
+
+    report = "\n".join(sections)
+    with open(args.report, 'w') as f:
+        f.write(report)
+    print(report)
+    print(f"Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
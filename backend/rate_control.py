@@ -0,0 +1,49 @@
+# rate_control.py
+
+
+class DetectionRateController:
+    """
+    Chooses how often a feed is sampled for inference. Feeds idle at a slow
+    rate, speed up for suspect_hold seconds whenever a fire/smoke box passes
+    the loose suspicion threshold, and run at the alarm rate for as long as a
+    fire is being confirmed or followed up. All timing uses frame timestamps.
+    """
+    IDLE = 'idle'
+    SUSPECT = 'suspect'
+    ALARM = 'alarm'
+
+    def __init__(self, idle_fps=1.5, suspect_fps=8.0, alarm_fps=15.0, suspicion_conf=0.3, suspect_hold=5.0):
+        self.rates = {self.IDLE: idle_fps, self.SUSPECT: suspect_fps, self.ALARM: alarm_fps}
+        self.suspicion_conf = suspicion_conf
+        self.suspect_hold = suspect_hold
+
+        self.state = self.IDLE
+        self.last_sample_time = None
+        self.last_suspicion_time = None
+
+    @property
+    def interval(self):
+        return 1.0 / self.rates[self.state]
+
+    def due(self, timestamp):
+        """Whether the frame captured at timestamp should be sampled."""
+        if self.last_sample_time is None or timestamp - self.last_sample_time >= self.interval:
+            self.last_sample_time = timestamp
+            return True
+        return False
+
+    def update(self, timestamp, suspicion, incident):
+        """
+        Feed back the result of a sampled frame. suspicion is the highest
+        fire/smoke confidence in the frame; incident is True while the alert
+        logic is confirming a fire or in its post-fire window.
+        """
+        if suspicion >= self.suspicion_conf:
+            self.last_suspicion_time = timestamp
+
+        if incident:
+            self.state = self.ALARM
+        elif self.last_suspicion_time is not None and timestamp - self.last_suspicion_time < self.suspect_hold:
+            self.state = self.SUSPECT
+        else:
+            self.state = self.IDLE
@@ -4,6 +4,10 @@ from auth import token_required
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from datetime import datetime, timedelta
+from streams import discover_substream
+from config import Config
+import json
+import math
 
 def init_routes(app):
     WEBSOCKET_PORT = 8765  # Must match the port used in app.py
@@ -68,6 +72,7 @@ def init_routes(app):
             'name': feed.name,
             'location': feed.location,
             'rtsp_url': feed.rtsp_url,
+            'detection_url': feed.detection_stream,
             'fireDetected': feed.fire_detected,
             'lastFireTime': feed.last_fire_detected_time,
             'status': feed.status
@@ -84,17 +89,35 @@ def init_routes(app):
             ip = data.get('ip')
             username = data.get('username')
             password = data.get('password')
+            motion_threshold = data.get('motionThreshold')
+            detection_url = data.get('detectionUrl')
 
             if not all([name, location, ip, username, password]):
                 print("[ROUTE DEBUG] Missing required fields in add feed")
                 return jsonify({'message': 'Missing required fields'}), 400
 
+            if motion_threshold is not None:
+                try:
+                    if isinstance(motion_threshold, bool):
+                        raise ValueError
+                    motion_threshold = float(motion_threshold)
+                    if not math.isfinite(motion_threshold) or motion_threshold < 0:
+                        raise ValueError
+                except (TypeError, ValueError):
+                    print(f"[ROUTE DEBUG] Invalid motionThreshold in add feed: {motion_threshold!r}")
+                    return jsonify({'message': 'motionThreshold must be a non-negative number'}), 400
+
             rtsp_url = f"rtsp://{username}:{password}@{ip}:554/stream1"
+            if not detection_url and Config.SUBSTREAM_DISCOVERY:
+                # Detection runs on the camera's low-resolution substream when it has one
+                detection_url = discover_substream(rtsp_url)
             new_feed = Feed(
                 name=name,
                 location=location,
                 rtsp_url=rtsp_url,
-                user_id=current_user.id
+                detection_url=detection_url,
+                user_id=current_user.id,
+                motion_threshold=motion_threshold
             )
             db.session.add(new_feed)
             db.session.commit()
@@ -105,6 +128,7 @@ def init_routes(app):
                 'name': new_feed.name,
                 'location': new_feed.location,
                 'rtsp_url': new_feed.rtsp_url,
+                'detection_url': new_feed.detection_stream,
                 'fireDetected': new_feed.fire_detected,
                 'lastFireTime': new_feed.last_fire_detected_time,
                 'status': new_feed.status
@@ -127,11 +151,35 @@ def init_routes(app):
             'name': feed.name,
             'location': feed.location,
             'rtsp_url': feed.rtsp_url,
+            'detection_url': feed.detection_stream,
             'fireDetected': feed.fire_detected,
             'lastFireTime': feed.last_fire_detected_time,
-            'status': feed.status
+            'status': feed.status,
+            'roi': json.loads(feed.roi) if feed.roi else None
         })
 
+    @app.route('/feeds/<int:feed_id>/roi', methods=['PUT'])
+    @token_required
+    def set_feed_roi(current_user, feed_id):
+        print(f"[ROUTE DEBUG] Setting ROI for feed {feed_id}, user {current_user.id}")
+        feed = Feed.query.filter_by(id=feed_id, user_id=current_user.id).first()
+        if not feed:
+            return jsonify({'message': 'Feed not found'}), 404
+
+        data = request.json or {}
+        roi = data.get('roi')
+        if roi is None:
+            feed.roi = None
+        else:
+            # tiling pulls in OpenCV/NumPy, which the API only loads when an ROI is set
+            from tiling import parse_roi
+            try:
+                feed.roi = json.dumps(parse_roi(roi))
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
+        db.session.commit()
+        return jsonify({'id': feed.id, 'roi': roi})
+
     @app.route('/feeds/<int:feed_id>/stream', methods=['GET'])
     @token_required
     def video_feed_info(current_user, feed_id):
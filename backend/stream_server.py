@@ -0,0 +1,255 @@
+# stream_server.py
+# Asyncio MJPEG service. Viewers are coroutines awaiting frames from one
+# shared source per feed instead of a thread each, so idle connections
+# don't pin threads.
+#
+#   python stream_server.py        (port 5004, same /mjpeg/<feed_id>?token= URLs as the API)
+import asyncio
+import logging
+import threading
+
+import jwt
+from aiohttp import web
+from flask import Flask
+
+from config import Config
+from ingest import hub
+from models import db, Feed
+from metadata import frame_metadata, sse_event
+from mjpeg import MjpegBroadcaster, part, slow_drops
+
+# Logging setup
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Flask app for database configuration
+flask_app = Flask(__name__)
+flask_app.config.from_object(Config)
+db.init_app(flask_app)
+
+
+class AsyncFeed:
+    """
+    Bridges one feed's ingest into the event loop. A single thread waits for
+    new frames, encodes each once per quality/overlay its viewers asked for,
+    builds its detection record and wakes the viewer coroutines; it
+    unsubscribes once the last viewer has left.
+    """
+    def __init__(self, feed_id, url, detection_url, loop):
+        self.feed_id = feed_id
+        self.url = url
+        self.detection_url = detection_url
+        self.loop = loop
+        self.encoder = MjpegBroadcaster(feed_id, url, detection_url)
+        # (quality, overlay) -> number of MJPEG viewers using it; metadata viewers need no encode
+        self.qualities = {}
+        self.viewers = 0
+        self.latest = None
+        self.condition = asyncio.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"mjpeg-feed-{feed_id}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        subscription = hub.subscribe(self.url, self.detection_url)
+        try:
+            while self.running:
+                item = subscription.get()
+                if item is None:
+                    continue
+                frames = {}
+                for key in list(self.qualities):
+                    data = self.encoder.jpeg(item, *key)
+                    if data is not None:
+                        frames[key] = data
+                published = (item.seq, item.timestamp, frames, sse_event(frame_metadata(item)))
+                asyncio.run_coroutine_threadsafe(self._publish(published), self.loop)
+        finally:
+            subscription.close()
+            logger.info(f"Released feed {self.feed_id} after its last viewer left")
+
+    async def _publish(self, latest):
+        async with self.condition:
+            self.latest = latest
+            self.condition.notify_all()
+
+    async def wait(self, after_seq):
+        """(seq, timestamp, {(quality, overlay): jpeg}, metadata event) of the first frame newer than after_seq, or None once stopped."""
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: not self.running or (self.latest is not None and self.latest[0] > after_seq))
+            return self.latest if self.running else None
+
+    async def stop(self):
+        async with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+
+def _feed_urls(feed_id, user_id):
+    # (viewing URL, detection stream) of the user's feed
+    with flask_app.app_context():
+        feed = Feed.query.filter_by(id=feed_id, user_id=user_id).first()
+        return (feed.rtsp_url, feed.detection_stream) if feed and feed.rtsp_url else None
+
+
+def _join(app, feed_id, urls, key=None):
+    feed = app['feeds'].get(feed_id)
+    if feed is None or (feed.url, feed.detection_url) != urls:
+        feed = app['feeds'][feed_id] = AsyncFeed(feed_id, *urls, asyncio.get_running_loop())
+    feed.viewers += 1
+    if key:
+        feed.qualities[key] = feed.qualities.get(key, 0) + 1
+    return feed
+
+
+async def _leave(app, feed, key=None):
+    feed.viewers -= 1
+    if key:
+        feed.qualities[key] -= 1
+        if not feed.qualities[key]:
+            del feed.qualities[key]
+    if feed.viewers == 0:
+        if app['feeds'].get(feed.feed_id) is feed:
+            del app['feeds'][feed.feed_id]
+        await feed.stop()
+
+
+async def _authorize(request):
+    """(feed_id, (viewing URL, detection stream)) for the token's owner; raises the HTTP error otherwise."""
+    feed_id = int(request.match_info['feed_id'])
+    token = request.query.get('token')
+    if not token:
+        raise web.HTTPUnauthorized(text="Unauthorized")
+
+    try:
+        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        raise web.HTTPForbidden(text="Invalid token")
+
+    urls = await asyncio.get_running_loop().run_in_executor(None, _feed_urls, feed_id, payload['user_id'])
+    if not urls:
+        raise web.HTTPNotFound(text="Feed not found")
+    return feed_id, urls
+
+
+async def mjpeg_stream(request):
+    feed_id, urls = await _authorize(request)
+
+    try:
+        quality = min(max(int(request.query.get('quality', Config.MJPEG_QUALITY)), 10), 95)
+        max_fps = min(max(float(request.query.get('fps', Config.MJPEG_MAX_FPS)), 0.5), 30)
+    except ValueError:
+        return web.Response(status=400, text="Invalid quality or fps")
+    # overlay=0 streams the plain video for clients that draw from /detections
+    key = (quality, request.query.get('overlay', '1') != '0')
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'multipart/x-mixed-replace; boundary=frame',
+        'Cache-Control': 'no-cache',
+    })
+    await response.prepare(request)
+
+    loop = asyncio.get_running_loop()
+    feed = _join(request.app, feed_id, urls, key)
+    interval = 1.0 / max_fps
+    last_seq = sent = dropped = 0
+    last_sent = None
+    try:
+        while True:
+            latest = await feed.wait(last_seq)
+            if latest is None:
+                break
+            seq, timestamp, frames, _ = latest
+            last_seq = seq
+            data = frames.get(key)
+            if data is None:
+                # Published before this quality was requested
+                continue
+            if last_sent:
+                # Only frames lost to a slow client, not the ones the fps cap skips
+                dropped += slow_drops(seq, timestamp, *last_sent, interval)
+            last_sent = (seq, timestamp)
+            started = loop.time()
+            # Awaits the client's socket; a slow client skips to the newest frame afterwards
+            await response.write(part(data, seq, timestamp))
+            sent += 1
+            delay = interval - (loop.time() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+    except ConnectionResetError:
+        pass
+    finally:
+        await _leave(request.app, feed, key)
+        logger.info(f"Viewer of feed {feed_id} left after {sent} frames ({dropped} dropped), "
+                    f"{feed.viewers} viewers remain")
+    return response
+
+
+async def detection_events(request):
+    """Server-sent events with one detection record per frame, aligned with the MJPEG parts."""
+    feed_id, urls = await _authorize(request)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    await response.prepare(request)
+
+    feed = _join(request.app, feed_id, urls)
+    last_seq = 0
+    try:
+        while True:
+            latest = await feed.wait(last_seq)
+            if latest is None:
+                break
+            last_seq, _, _, event = latest
+            await response.write(event)
+    except ConnectionResetError:
+        pass
+    finally:
+        await _leave(request.app, feed)
+    return response
+
+
+def _user_feed_ids(user_id):
+    with flask_app.app_context():
+        return {feed_id for feed_id, in db.session.query(Feed.id).filter_by(user_id=user_id)}
+
+
+async def stats(request):
+    """Viewer and encode counts of the caller's feeds."""
+    token = request.query.get('token')
+    if not token:
+        raise web.HTTPUnauthorized(text="Unauthorized")
+    try:
+        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        raise web.HTTPForbidden(text="Invalid token")
+
+    feed_ids = await asyncio.get_running_loop().run_in_executor(None, _user_feed_ids, payload['user_id'])
+    return web.json_response([{
+        'feedId': feed.feed_id,
+        'viewers': feed.viewers,
+        'encodes': feed.encoder.encodes,
+    } for feed in request.app['feeds'].values() if feed.feed_id in feed_ids])
+
+
+async def _shutdown(app):
+    for feed in list(app['feeds'].values()):
+        await feed.stop()
+
+
+def create_app():
+    app = web.Application()
+    app['feeds'] = {}
+    app.router.add_get('/mjpeg/{feed_id:\\d+}', mjpeg_stream)
+    app.router.add_get('/detections/{feed_id:\\d+}', detection_events)
+    app.router.add_get('/stats', stats)
+    app.on_shutdown.append(_shutdown)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(), host='0.0.0.0', port=5004)
@@ -0,0 +1,110 @@
+# streaming.py
+# Stream endpoints backed by the detector. The REST API registers this
+# blueprint (SERVE_STREAMS) and loads the model stack on the first request;
+# running this file serves the streams from a separate process instead.
+import logging
+
+import jwt
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
+from flask_cors import CORS
+
+from config import Config
+from models import db, User, Feed
+
+streaming = Blueprint('streaming', __name__)
+
+
+@streaming.route('/mjpeg/<int:feed_id>')
+def mjpeg_stream(feed_id):
+    token = request.args.get('token')
+    if not token:
+        return "Unauthorized", 401
+
+    try:
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return "Invalid token", 403
+
+    with current_app.app_context():
+        user = db.session.get(User, payload['user_id'])
+        if not user:
+            return "User not found", 404
+        feed = Feed.query.filter_by(id=feed_id, user_id=user.id).first()
+        if not feed or not feed.rtsp_url:
+            return "Feed not found", 404
+
+    quality = min(max(request.args.get('quality', Config.MJPEG_QUALITY, type=int), 10), 95)
+    max_fps = min(max(request.args.get('fps', Config.MJPEG_MAX_FPS, type=float), 0.5), 30)
+    # overlay=0 streams the plain video for clients that draw from /detections
+    overlay = request.args.get('overlay', '1') != '0'
+
+    # Imported on first use so the API process boots without OpenCV or the model stack
+    import mjpeg
+
+    body = mjpeg.stream(feed_id, feed.rtsp_url, quality, max_fps, overlay, feed.detection_stream)
+    return Response(body, mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@streaming.route('/detections/<int:feed_id>')
+def detection_events(feed_id):
+    """Server-sent events with one detection record per frame, aligned with the MJPEG parts."""
+    token = request.args.get('token')
+    if not token:
+        return "Unauthorized", 401
+
+    try:
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return "Invalid token", 403
+
+    feed = Feed.query.filter_by(id=feed_id, user_id=payload['user_id']).first()
+    if not feed or not feed.rtsp_url:
+        return "Feed not found", 404
+    min_conf = request.args.get('conf', 0.0, type=float)
+
+    from ingest import hub
+    from metadata import frame_metadata, sse_event
+
+    def generate():
+        with hub.subscribe(feed.rtsp_url, feed.detection_stream) as subscription:
+            while True:
+                item = subscription.get()
+                if item is None:
+                    # Comment line so proxies don't close a stream that is waiting on the camera
+                    yield b': waiting\n\n'
+                    continue
+                yield sse_event(frame_metadata(item, min_conf))
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@streaming.route('/mjpeg/stats')
+def mjpeg_stats():
+    """Per-feed encode counts and per-viewer sent/dropped frames for the caller's feeds."""
+    token = request.args.get('token')
+    if not token:
+        return "Unauthorized", 401
+
+    try:
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return "Invalid token", 403
+
+    feed_ids = {feed_id for feed_id, in db.session.query(Feed.id).filter_by(user_id=payload['user_id'])}
+    import mjpeg
+    return jsonify(mjpeg.stats(feed_ids))
+
+
+def create_app():
+    app = Flask(__name__)
+    CORS(app, resources={r"/*": {"origins": "*"}})
+    app.config.from_object(Config)
+    db.init_app(app)
+    app.register_blueprint(streaming)
+    return app
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    create_app().run(host='0.0.0.0', port=5003, threaded=True)
@@ -0,0 +1,48 @@
+# streams.py
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Main-stream path -> low-resolution substream path on common camera firmwares
+SUBSTREAM_PATTERNS = (
+    (re.compile(r'/stream1$'), '/stream2'),  # TP-Link Tapo
+    (re.compile(r'/Streaming/Channels/(\d*)01$'), r'/Streaming/Channels/\g<1>02'),  # Hikvision
+    (re.compile(r'subtype=0'), 'subtype=1'),  # Dahua / Amcrest
+    (re.compile(r'_main$'), '_sub'),  # Reolink
+)
+
+
+def substream_candidates(url):
+    candidates = []
+    for pattern, replacement in SUBSTREAM_PATTERNS:
+        candidate = pattern.sub(replacement, url)
+        if candidate != url and candidate not in candidates:
+            candidates.append(candidate)
+    return candidates
+
+
+def probe_stream(url, timeout=3.0):
+    """(width, height) of the stream's video track, or None when it can't be opened."""
+    # PyAV is only needed here, so the API doesn't pay for it at startup
+    import av
+
+    try:
+        with av.open(url, options={'rtsp_transport': 'tcp'}, timeout=timeout) as container:
+            if not container.streams.video:
+                return None
+            codec = container.streams.video[0].codec_context
+            return codec.width, codec.height
+    except Exception as e:
+        logger.info(f"Probing {url} failed: {e}")
+        return None
+
+
+def discover_substream(url, timeout=3.0):
+    """First substream candidate of url that serves video, or None."""
+    for candidate in substream_candidates(url):
+        size = probe_stream(candidate, timeout)
+        if size:
+            logger.info(f"Found substream {candidate} ({size[0]}x{size[1]})")
+            return candidate
+    return None
@@ -0,0 +1,137 @@
+# tiling.py
+import json
+
+import cv2
+import numpy as np
+
+from detectors import Detections
+
+
+def parse_roi(value):
+    """
+    Feed.roi is stored as JSON: a list of polygons, each a list of [x, y]
+    points normalised to 0-1 so it applies to any stream resolution.
+    Raises ValueError on malformed input.
+    """
+    polygons = json.loads(value) if isinstance(value, str) else value
+    if not isinstance(polygons, list) or not polygons:
+        raise ValueError("ROI must be a non-empty list of polygons")
+    for polygon in polygons:
+        if not isinstance(polygon, list) or len(polygon) < 3:
+            raise ValueError("Each ROI polygon needs at least 3 points")
+        for point in polygon:
+            if (not isinstance(point, (list, tuple)) or len(point) != 2
+                    or not all(isinstance(v, (int, float)) and 0 <= v <= 1 for v in point)):
+                raise ValueError("ROI points must be [x, y] pairs between 0 and 1")
+    return polygons
+
+
+class RegionOfInterest:
+    """Polygon ROI rasterised (and cached) per frame size."""
+    def __init__(self, polygons):
+        self.polygons = [np.array(polygon, np.float32) for polygon in polygons]
+        self._masks = {}
+
+    def mask(self, shape):
+        h, w = shape[:2]
+        if (h, w) not in self._masks:
+            mask = np.zeros((h, w), np.uint8)
+            scaled = [np.round(polygon * [w - 1, h - 1]).astype(np.int32) for polygon in self.polygons]
+            cv2.fillPoly(mask, scaled, 1)
+            self._masks[(h, w)] = mask
+        return self._masks[(h, w)]
+
+    def filter(self, detections, shape):
+        """Keep only boxes whose centre falls inside the ROI."""
+        if not len(detections):
+            return detections
+        mask = self.mask(shape)
+        h, w = mask.shape
+        cx = ((detections.xyxy[:, 0] + detections.xyxy[:, 2]) / 2).astype(np.int32).clip(0, w - 1)
+        cy = ((detections.xyxy[:, 1] + detections.xyxy[:, 3]) / 2).astype(np.int32).clip(0, h - 1)
+        return detections.select(mask[cy, cx] > 0)
+
+
+def merge_nms(detections, iou_threshold=0.5, ios_threshold=0.8):
+    """
+    Class-aware greedy NMS for boxes gathered from overlapping tiles. A box is
+    also suppressed when most of it lies inside a higher-scoring box, which
+    removes the partial boxes cut off at tile seams.
+    """
+    if len(detections) < 2:
+        return detections
+    order = np.argsort(-detections.conf)
+    boxes, cls = detections.xyxy[order], detections.cls[order]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    suppressed = np.zeros(len(order), bool)
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        rest = np.arange(i + 1, len(order))
+        rest = rest[~suppressed[rest] & (cls[rest] == cls[i])]
+        if not len(rest):
+            continue
+        lt = np.maximum(boxes[i, :2], boxes[rest, :2])
+        rb = np.minimum(boxes[i, 2:], boxes[rest, 2:])
+        inter = np.prod(np.clip(rb - lt, 0, None), axis=1)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        ios = inter / (np.minimum(areas[i], areas[rest]) + 1e-9)
+        suppressed[rest[(iou > iou_threshold) | (ios > ios_threshold)]] = True
+    return detections.select(order[~suppressed])
+
+
+class TiledInference:
+    """
+    Runs a detector on full-resolution tiles of the model's input size that
+    overlap the ROI (or an extra region), in one batch, and merges the boxes
+    back into frame coordinates. Compute scales with the monitored area.
+    """
+    def __init__(self, tile_size=640, overlap=0.2, roi=None):
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.roi = roi
+        self._tiles = {}
+
+    @staticmethod
+    def _starts(length, tile, stride):
+        if length <= tile:
+            return [0]
+        starts = list(range(0, length - tile, stride))
+        starts.append(length - tile)
+        return starts
+
+    def tiles(self, shape):
+        """Tiles (x1, y1, x2, y2) for a frame size, restricted to the ROI."""
+        h, w = shape[:2]
+        if (h, w) not in self._tiles:
+            stride = max(int(self.tile_size * (1 - self.overlap)), 1)
+            mask = self.roi.mask(shape) if self.roi else None
+            tiles = []
+            for y in self._starts(h, self.tile_size, stride):
+                for x in self._starts(w, self.tile_size, stride):
+                    tile = (x, y, min(x + self.tile_size, w), min(y + self.tile_size, h))
+                    if mask is None or mask[tile[1]:tile[3], tile[0]:tile[2]].any():
+                        tiles.append(tile)
+            self._tiles[(h, w)] = tiles
+        return self._tiles[(h, w)]
+
+    def run(self, model, frame, region=None):
+        tiles = self.tiles(frame.shape)
+        if region:
+            rx1, ry1, rx2, ry2 = region
+            tiles = [t for t in tiles if t[0] < rx2 and t[2] > rx1 and t[1] < ry2 and t[3] > ry1]
+        if not tiles:
+            return Detections.empty(model.names)
+
+        results = model.predict([frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles])
+        shifted = [result.shifted(x1, y1) for result, (x1, y1, _, _) in zip(results, tiles)]
+        merged = Detections(
+            np.concatenate([d.xyxy for d in shifted]),
+            np.concatenate([d.conf for d in shifted]),
+            np.concatenate([d.cls for d in shifted]),
+            model.names,
+        )
+        merged = merge_nms(merged)
+        if self.roi:
+            merged = self.roi.filter(merged, frame.shape)
+        return merged
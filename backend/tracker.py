@@ -0,0 +1,177 @@
+# tracker.py
+import itertools
+from collections import deque
+
+import numpy as np
+
+from detectors import Detections
+from postprocess import class_ids
+
+
+def _xyxy_to_cxcywh(box):
+    x1, y1, x2, y2 = box
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], np.float64)
+
+
+def _iou_matrix(a, b):
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)))
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class Track:
+    """
+    One object followed across frames with a constant-velocity Kalman filter
+    over (cx, cy, w, h). Time steps come from frame timestamps, so tracks
+    coast correctly across skipped or slowly sampled frames.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, box, conf, cls, timestamp, history=10):
+        self.id = next(self._ids)
+        self.cls = cls
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.last_predicted = timestamp
+        self.hits = 1
+        self.confidences = deque([conf], maxlen=history)
+
+        self.x = np.zeros(8)
+        self.x[:4] = _xyxy_to_cxcywh(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 100.0, 100.0, 100.0, 100.0])
+
+    @property
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        w, h = max(w, 1.0), max(h, 1.0)
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], np.float32)
+
+    @property
+    def confidence(self):
+        return float(np.mean(self.confidences))
+
+    def age(self, timestamp):
+        return timestamp - self.first_seen
+
+    def predict(self, timestamp):
+        dt = timestamp - self.last_predicted
+        if dt <= 0:
+            return
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+        # Process noise grows with the gap and the object's size
+        scale = max(self.x[2], self.x[3], 1.0)
+        Q = np.diag([1, 1, 1, 1, 10, 10, 10, 10]) * (0.05 * scale) ** 2 * dt
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+        self.last_predicted = timestamp
+
+    def update(self, box, conf, timestamp):
+        z = _xyxy_to_cxcywh(box)
+        H = np.hstack([np.eye(4), np.zeros((4, 4))])
+        R = np.eye(4) * (0.05 * max(z[2], z[3], 1.0)) ** 2
+        S = H @ self.P @ H.T + R
+        K = self.P @ H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - H @ self.x)
+        self.P = (np.eye(8) - K @ H) @ self.P
+        self.last_seen = timestamp
+        self.hits += 1
+        self.confidences.append(conf)
+
+
+class Tracker:
+    """
+    ByteTrack-style IoU tracker. High-confidence detections are matched to
+    tracks first, then low-confidence ones keep existing tracks alive through
+    flicker; only high-confidence detections start new tracks. Unmatched
+    tracks coast on their Kalman prediction for up to max_coast seconds.
+    """
+    def __init__(self, labels=("fire", "smoke"), high_conf=0.5, low_conf=0.25, match_iou=0.3,
+                 max_coast=1.5, min_hits=3, coast_interval=0.5):
+        self.labels = labels
+        self.high_conf = high_conf
+        self.low_conf = low_conf
+        self.match_iou = match_iou
+        self.max_coast = max_coast
+        self.min_hits = min_hits
+        self.coast_interval = coast_interval
+        self.tracks = []
+        self.last_update = None
+
+    def _match(self, tracks, boxes, classes):
+        """Greedy IoU matching within each class; returns [(track_idx, det_idx)]."""
+        if not tracks or not len(boxes):
+            return []
+        iou = _iou_matrix(np.array([t.box for t in tracks]), boxes)
+        iou[np.array([t.cls for t in tracks])[:, None] != classes[None, :]] = 0
+        matches = []
+        while True:
+            t, d = np.unravel_index(iou.argmax(), iou.shape)
+            if iou[t, d] < self.match_iou:
+                return matches
+            matches.append((t, d))
+            iou[t, :] = 0
+            iou[:, d] = 0
+
+    def coast(self, timestamp):
+        """Advance tracks to timestamp without new detections."""
+        for track in self.tracks:
+            track.predict(timestamp)
+        self.tracks = [t for t in self.tracks if timestamp - t.last_seen <= self.max_coast]
+
+    def update(self, detections, timestamp):
+        self.coast(timestamp)
+        self.last_update = timestamp
+
+        keep = np.isin(detections.cls, class_ids(detections.names, self.labels)) & (detections.conf >= self.low_conf)
+        boxes, conf, cls = detections.xyxy[keep], detections.conf[keep], detections.cls[keep]
+        high = conf >= self.high_conf
+
+        unmatched_tracks = list(self.tracks)
+        for first_pass, det_mask in ((True, high), (False, ~high)):
+            indices = np.flatnonzero(det_mask)
+            matches = self._match(unmatched_tracks, boxes[indices], cls[indices])
+            for t, d in matches:
+                unmatched_tracks[t].update(boxes[indices[d]], float(conf[indices[d]]), timestamp)
+            matched_tracks = {t for t, _ in matches}
+            unmatched_tracks = [track for i, track in enumerate(unmatched_tracks) if i not in matched_tracks]
+            if first_pass:
+                matched_dets = {d for _, d in matches}
+                for d in indices[[i for i in range(len(indices)) if i not in matched_dets]]:
+                    self.tracks.append(Track(boxes[d], float(conf[d]), int(cls[d]), timestamp))
+        return self.tracks
+
+    def should_infer(self, timestamp):
+        """
+        Whether the next frame needs a forward pass. Tentative tracks and empty
+        scenes always do; once every track is established the detector only
+        refreshes them every coast_interval seconds.
+        """
+        if not self.tracks or self.last_update is None:
+            return True
+        if any(track.hits < self.min_hits for track in self.tracks):
+            return True
+        return timestamp - self.last_update >= self.coast_interval
+
+    def oldest(self, names, labels, min_conf=0.0):
+        """Longest-lived track of the given labels whose recent confidence is above min_conf."""
+        ids = set(class_ids(names, labels).tolist())
+        candidates = [t for t in self.tracks
+                      if t.cls in ids and t.hits >= self.min_hits and t.confidence > min_conf]
+        return min(candidates, key=lambda t: t.first_seen, default=None)
+
+    def detections(self, names):
+        """Current track boxes as Detections, e.g. to draw between inferences."""
+        if not self.tracks:
+            return Detections.empty(names)
+        return Detections(
+            np.array([t.box for t in self.tracks], np.float32),
+            np.array([t.confidence for t in self.tracks], np.float32),
+            np.array([t.cls for t in self.tracks], np.int32),
+            names,
+        )
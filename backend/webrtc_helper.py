@@ -1,30 +1,90 @@
 # webrtc_helper.py
+import asyncio
+import logging
+import threading
+from fractions import Fraction
+
 from aiortc import VideoStreamTrack
+from aiortc.mediastreams import MediaStreamError
 from av import VideoFrame
-import time
-import asyncio
+
+from ingest import hub
+
+logger = logging.getLogger(__name__)
+
+VIDEO_CLOCK_RATE = 90000
+VIDEO_TIME_BASE = Fraction(1, VIDEO_CLOCK_RATE)
+
 
 class MLVideoStreamTrack(VideoStreamTrack):
     """
-    A custom VideoStreamTrack that pulls frames from your Camera.
+    Annotated frames of one feed as a WebRTC video track. A bridge thread
+    waits on the feed's shared ingest, converts each frame to a VideoFrame
+    once and hands it to the event loop; recv() wakes on that instead of
+    polling. Meant to be the single source of a MediaRelay, which fans the
+    frames out to every peer watching the feed. Must be created on the loop
+    that will call recv().
     """
-    def __init__(self, camera):
+    def __init__(self, url, detection_url=None):
         super().__init__()
-        self.camera = camera
-        self.last_frame_time = None
+        self.url = url
+        self.detection_url = detection_url
+        self.frames = 0
+        self.dropped = 0
+        self._loop = asyncio.get_running_loop()
+        self._new_frame = asyncio.Event()
+        self._latest = None
+        self._sent_seq = 0
+        self._first_timestamp = None
+        self._last_pts = -1
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"webrtc-{url}", daemon=True)
+        self._thread.start()
+
+    def _pts(self, timestamp):
+        # Capture time, not the time recv() ran, so jitter in the pipeline doesn't reach the player
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        pts = int((timestamp - self._first_timestamp) * VIDEO_CLOCK_RATE)
+        # A reconnect can step the camera's clock back; timestamps must still increase
+        self._last_pts = max(pts, self._last_pts + 1)
+        return self._last_pts
+
+    def _run(self):
+        subscription = hub.subscribe(self.url, self.detection_url)
+        try:
+            while self._running:
+                item = subscription.get()
+                if item is None:
+                    continue
+                frame = VideoFrame.from_ndarray(item.annotated, format="bgr24")
+                frame.pts = self._pts(item.timestamp)
+                frame.time_base = VIDEO_TIME_BASE
+                self._loop.call_soon_threadsafe(self._publish, item.seq, frame)
+        finally:
+            subscription.close()
+
+    def _publish(self, seq, frame):
+        self._latest = (seq, frame)
+        self._new_frame.set()
 
     async def recv(self):
-        # Wait for the next frame – try to obtain a raw frame.
-        frame = None
-        while frame is None:
-            frame = self.camera.get_raw_frame()
-            await asyncio.sleep(0.001)  # Yield event loop briefly
-        # Convert the raw NumPy frame (assumed BGR) to an AV VideoFrame.
-        video_frame = VideoFrame.from_ndarray(frame, format="bgr24")
-        now = time.time()
-        if self.last_frame_time is None:
-            self.last_frame_time = now
-        video_frame.pts = int(now * 90000)
-        video_frame.time_base = 1 / 90000
-        self.last_frame_time = now
-        return video_frame
+        # Newest frame not yet sent; frames replaced while the encoder was busy are skipped
+        while self._running and (self._latest is None or self._latest[0] <= self._sent_seq):
+            self._new_frame.clear()
+            await self._new_frame.wait()
+        if not self._running:
+            raise MediaStreamError
+        seq, frame = self._latest
+        if self._sent_seq:
+            self.dropped += seq - self._sent_seq - 1
+        self._sent_seq = seq
+        self.frames += 1
+        return frame
+
+    def stop(self):
+        super().stop()
+        if self._running:
+            self._running = False
+            self._new_frame.set()
+            logger.info(f"WebRTC track for {self.url} stopped after {self.frames} frames ({self.dropped} dropped)")
@@ -1,25 +1,155 @@
 # webrtc_server.py
+# WebRTC signaling over Socket.IO. Peer connections live on one long-lived
+# asyncio loop in its own thread; each feed has one source track, shared by
+# all of its peers through a MediaRelay.
+#
+#   python webrtc_server.py        (port 5002)
 import asyncio
-from flask import Flask
-from flask_socketio import SocketIO, emit
+import logging
+import threading
+
+import jwt
 from aiortc import RTCPeerConnection, RTCSessionDescription
-from webrtc_helper import MLVideoStreamTrack
-from camera import Camera
-from models import db, Feed, User
+from aiortc.contrib.media import MediaRelay
+from aiortc.sdp import candidate_from_sdp
+from flask import Flask, request
+from flask_socketio import SocketIO, emit
+
 from config import Config
-import jwt
+from models import db, Feed
+from webrtc_helper import MLVideoStreamTrack
+
+# Logging setup
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config.from_object(Config)
+db.init_app(app)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
 
-def get_feed_camera_url(feed_id, user_id):
+# Seconds a Socket.IO handler waits for the loop to answer an offer (ICE gathering included)
+OFFER_TIMEOUT = 15
+
+# Signaling handlers run on Socket.IO threads; all aiortc objects belong to this loop
+loop = asyncio.new_event_loop()
+threading.Thread(target=loop.run_forever, name="webrtc-loop", daemon=True).start()
+
+relay = MediaRelay()
+# rtsp_url -> _Source, sid -> _Peer, sid -> candidates received before its offer was applied;
+# only touched on the loop
+sources = {}
+peers = {}
+pending_candidates = {}
+
+
+class _Source:
+    def __init__(self, track):
+        self.track = track
+        self.peers = 0
+
+
+class _Peer:
+    def __init__(self, pc, url, track):
+        self.pc = pc
+        self.url = url
+        self.track = track
+        # Set once the offer is applied; candidates that arrive earlier are queued until then
+        self.ready = False
+
+
+def get_feed_camera_urls(feed_id, user_id):
+    # (viewing URL, detection stream) of the user's feed
     with app.app_context():
         feed = Feed.query.filter_by(id=feed_id, user_id=user_id).first()
         if feed and feed.rtsp_url:
-            return feed.rtsp_url
+            return feed.rtsp_url, feed.detection_stream
     return None
 
+
+def _run(coro, timeout=OFFER_TIMEOUT):
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+async def _open_peer(sid, url, detection_url, sdp):
+    # A new offer on the same socket replaces the previous connection
+    if sid in peers:
+        await _close_peer(sid)
+
+    source = sources.get(url)
+    if source is None:
+        source = sources[url] = _Source(MLVideoStreamTrack(url, detection_url))
+    source.peers += 1
+
+    pc = RTCPeerConnection()
+    # buffered=False: every peer gets the newest frame instead of a backlog
+    peer = peers[sid] = _Peer(pc, url, relay.subscribe(source.track, buffered=False))
+    pc.addTrack(peer.track)
+
+    @pc.on("connectionstatechange")
+    async def on_connectionstatechange():
+        logger.info(f"Peer {sid} connection state: {pc.connectionState}")
+        if pc.connectionState in ("failed", "closed") and peers.get(sid) is peer:
+            await _close_peer(sid)
+
+    try:
+        await pc.setRemoteDescription(RTCSessionDescription(sdp, 'offer'))
+        peer.ready = True
+        # Socket.IO handlers run concurrently, so the browser's first candidates may have beaten the offer here
+        for candidate in pending_candidates.pop(sid, []):
+            await pc.addIceCandidate(candidate)
+        await pc.setLocalDescription(await pc.createAnswer())
+    except Exception:
+        await _close_peer(sid)
+        raise
+    logger.info(f"Peer {sid} opened for {url} ({source.peers} peers on this feed)")
+    return {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type}
+
+
+async def _add_candidate(sid, candidate):
+    peer = peers.get(sid)
+    if peer is None or not peer.ready:
+        # Applied by _open_peer once the offer is; dropped with the socket if no offer comes
+        pending_candidates.setdefault(sid, []).append(candidate)
+        return
+    await peer.pc.addIceCandidate(candidate)
+
+
+async def _close_peer(sid):
+    peer = peers.pop(sid, None)
+    if peer is None:
+        return
+    peer.track.stop()
+    await peer.pc.close()
+    source = sources.get(peer.url)
+    if source is not None:
+        source.peers -= 1
+        if source.peers == 0:
+            # Releases this feed's ingest subscription; the camera closes once nothing else watches it
+            del sources[peer.url]
+            source.track.stop()
+    logger.info(f"Peer {sid} closed ({len(peers)} peers open)")
+
+
+async def _disconnect(sid):
+    pending_candidates.pop(sid, None)
+    await _close_peer(sid)
+
+
+def _parse_candidate(data):
+    """RTCIceCandidate from a browser's candidate JSON, or None for end-of-candidates."""
+    init = data.get('candidate', data)
+    if not isinstance(init, dict):
+        init = data
+    line = init.get('candidate') or ''
+    if not line:
+        return None
+    candidate = candidate_from_sdp(line.split(':', 1)[1] if line.startswith('candidate:') else line)
+    candidate.sdpMid = init.get('sdpMid')
+    candidate.sdpMLineIndex = init.get('sdpMLineIndex')
+    return candidate
+
+
 @socketio.on('offer')
 def handle_offer(data):
     """
@@ -30,52 +160,60 @@ def handle_offer(data):
          'sdp': '<offer sdp>'
       }
     """
-    print("[SIGNALING] Received offer:", data)
     try:
         feed_id = int(data['feed_id'])
         token = data['token']
         sdp = data['sdp']
-    except Exception as e:
+    except Exception:
         emit('error', {'error': 'Invalid data format'})
         return
 
     try:
         payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id = payload['user_id']
-    except Exception as e:
+    except Exception:
         emit('error', {'error': 'Invalid token'})
         return
 
-    camera_url = get_feed_camera_url(feed_id, user_id)
-    if not camera_url:
+    camera_urls = get_feed_camera_urls(feed_id, user_id)
+    if not camera_urls:
         emit('error', {'error': 'Feed not found or RTSP URL missing'})
         return
 
-    pc = RTCPeerConnection()
-    print(f"[SIGNALING] Created PeerConnection for feed {feed_id}")
-
-    camera = Camera(camera_url)
-    local_video = MLVideoStreamTrack(camera)
-    pc.addTrack(local_video)
-
-    async def run_offer():
-        await pc.setRemoteDescription(RTCSessionDescription(sdp, 'offer'))
-        answer = await pc.createAnswer()
-        await pc.setLocalDescription(answer)
-        emit('answer', {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type})
-        print("[SIGNALING] Sent answer for feed", feed_id)
+    try:
+        answer = _run(_open_peer(request.sid, *camera_urls, sdp))
+    except Exception as e:
+        logger.error(f"Offer for feed {feed_id} failed: {e}")
+        emit('error', {'error': 'Could not negotiate the connection'})
+        return
+    emit('answer', answer)
 
-    asyncio.run_coroutine_threadsafe(run_offer(), asyncio.get_event_loop())
 
 @socketio.on('candidate')
 def handle_candidate(data):
-    # Optionally implement ICE candidate handling.
-    print("[SIGNALING] Candidate received:", data)
-    # For this minimal example, we are not forwarding ICE candidates.
+    # aiortc gathers its own candidates before answering, so only the browser's trickle in
+    try:
+        candidate = _parse_candidate(data)
+    except Exception as e:
+        logger.warning(f"Ignoring malformed ICE candidate from {request.sid}: {e}")
+        return
+    if candidate is None:
+        return
+    try:
+        _run(_add_candidate(request.sid, candidate))
+    except Exception as e:
+        logger.warning(f"Could not add ICE candidate from {request.sid}: {e}")
+
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    _run(_disconnect(request.sid))
+
 
 @app.route('/')
 def index():
     return "WebRTC Signaling Server Running"
 
+
 if __name__ == '__main__':
     socketio.run(app, host='0.0.0.0', port=5002)
@@ -0,0 +1,116 @@
+# worker_pool.py
+import logging
+import multiprocessing as mp
+import os
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(index, commands, threads):
+    # Thread pools are sized before torch/onnxruntime/OpenVINO are first imported in this process
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    Config.DETECTOR_THREADS = threads
+    import cv2
+    cv2.setNumThreads(threads)
+
+    from background import run_worker
+    run_worker(index, commands)
+
+
+class _Worker:
+    def __init__(self, process, commands):
+        self.process = process
+        self.commands = commands
+
+
+class WorkerPool:
+    """
+    Runs the feed detectors in worker processes so decoding, inference and
+    alert logic of different feeds don't contend for one GIL. Each worker
+    loads its own model copies and runs one FireDetector thread per assigned
+    feed. A worker that dies takes only its own feeds down; it is respawned
+    and those feeds are moved to the least loaded workers.
+    """
+    def __init__(self, workers, threads=0):
+        self.size = workers
+        # Without an explicit setting the cores are split evenly between workers
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        # Spawned workers start clean instead of inheriting the parent's DB connections and locks
+        self._context = mp.get_context('spawn')
+        self._workers = [None] * workers
+        self.assignments = {}
+        self.restarts = 0
+
+    def start(self):
+        for index in range(self.size):
+            self._spawn(index)
+
+    def _spawn(self, index):
+        commands = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, commands, self.threads),
+            name=f"detection-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._workers[index] = _Worker(process, commands)
+        logger.info(f"Started detection worker {index} (pid {process.pid}, {self.threads} threads)")
+
+    def load(self, index):
+        return sum(1 for assigned in self.assignments.values() if assigned == index)
+
+    def feeds(self, index):
+        return [feed_id for feed_id, assigned in self.assignments.items() if assigned == index]
+
+    def assign(self, feed_id):
+        if feed_id in self.assignments:
+            return
+        index = min(range(self.size), key=self.load)
+        self.assignments[feed_id] = index
+        self._workers[index].commands.put(('start', feed_id))
+
+    def remove(self, feed_id):
+        index = self.assignments.pop(feed_id, None)
+        if index is not None:
+            self._workers[index].commands.put(('stop', feed_id))
+
+    def restart(self, feed_id):
+        # Same worker, fresh detector: the worker reloads the feed row
+        index = self.assignments.get(feed_id)
+        if index is None:
+            self.assign(feed_id)
+            return
+        self._workers[index].commands.put(('stop', feed_id))
+        self._workers[index].commands.put(('start', feed_id))
+
+    def check(self):
+        for index, worker in enumerate(self._workers):
+            if worker.process.is_alive():
+                continue
+            orphans = self.feeds(index)
+            logger.error(f"Detection worker {index} (pid {worker.process.pid}) died with exit code "
+                         f"{worker.process.exitcode}; reassigning feeds {orphans}")
+            for feed_id in orphans:
+                del self.assignments[feed_id]
+            self.restarts += 1
+            self._spawn(index)
+            for feed_id in orphans:
+                self.assign(feed_id)
+
+    def log_stats(self):
+        for index, worker in enumerate(self._workers):
+            logger.info(f"Detection worker {index} (pid {worker.process.pid}): feeds {self.feeds(index)}")
+        if self.restarts:
+            logger.info(f"Detection workers restarted {self.restarts} times")
+
+    def stop(self, timeout=5):
+        for worker in self._workers:
+            worker.commands.put(('shutdown', None))
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self.assignments.clear()